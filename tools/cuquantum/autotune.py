@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Autotuning einsum dispatcher.
+
+The first time an (expression, shapes, dtypes) key is seen, every
+applicable lowering is timed:
+
+  einsum            numpy.einsum without optimize
+  einsum_optimize   numpy.einsum(optimize=True)
+  tensordot         np.tensordot + transpose (two operands, no batch index)
+  matmul            transpose/reshape to 2-D and `@` (two operands, no batch index)
+  batched_matmul    transpose/reshape to 3-D and np.matmul (two operands with batch indices)
+  planner           contraction_planner.contract (pairwise BLAS in planned order)
+
+Each candidate must reproduce the reference result. The fastest one is
+cached in memory and on disk ($MATHSHPC_CACHE_DIR/autotune.json, one
+section per numpy version / machine), and later calls dispatch straight to
+it. Einsum-style call sites get BLAS speed without being rewritten.
+
+Usage:
+  python3 autotune.py
+"""
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+from capabilities import cache_dir
+from contraction_planner import contract, pair_contract, parse_subscripts
+
+CACHE_FILE = "autotune.json"
+
+
+def _two_operand_groups(inputs, output):
+    xs, ys = inputs
+    if len(set(xs)) != len(xs) or len(set(ys)) != len(ys):
+        return None
+    shared = set(xs) & set(ys)
+    private_summed = [c for c in xs + ys if c not in shared and c not in output]
+    batch = [c for c in xs if c in shared and c in output]
+    return {"batch": batch, "private_summed": private_summed}
+
+
+def _tensordot(inputs, output, x, y):
+    xs, ys = inputs
+    inner = [c for c in xs if c in ys]
+    z = np.tensordot(x, y, axes=([xs.index(c) for c in inner], [ys.index(c) for c in inner]))
+    zs = "".join(c for c in xs + ys if c not in inner)
+    return z.transpose([zs.index(c) for c in output]) if zs != output else z
+
+
+def _matmul(inputs, output, x, y):
+    """(free, contracted) @ (contracted, free) as one 2-D product, no batch axis."""
+    xs, ys = inputs
+    inner = [c for c in xs if c in ys]
+    fx = [c for c in xs if c not in ys]
+    fy = [c for c in ys if c not in xs]
+    dim = dict(zip(xs, x.shape))
+    dim.update(zip(ys, y.shape))
+    nk = int(np.prod([dim[c] for c in inner], dtype=np.int64))
+    x2 = x.transpose([xs.index(c) for c in fx + inner]).reshape(-1, nk)
+    y2 = y.transpose([ys.index(c) for c in inner + fy]).reshape(nk, -1)
+    z = (x2 @ y2).reshape([dim[c] for c in fx + fy])
+    zs = "".join(fx + fy)
+    return z.transpose([zs.index(c) for c in output]) if zs != output else z
+
+
+def _tolerance(reference):
+    dtype = np.result_type(reference)
+    return float(np.sqrt(np.finfo(dtype).eps)) if np.issubdtype(dtype, np.inexact) else 0.0
+
+
+def candidates(subscripts, inputs, output):
+    """(name, fn(*operands)) for every lowering that applies to this expression."""
+    out = [
+        ("einsum", lambda *ops: np.einsum(subscripts, *ops)),
+        ("einsum_optimize", lambda *ops: np.einsum(subscripts, *ops, optimize=True)),
+        ("planner", lambda *ops: contract(subscripts, *ops)),
+    ]
+    if len(inputs) == 2:
+        groups = _two_operand_groups(inputs, output)
+        if groups is not None and not groups["private_summed"]:
+            xs, ys = inputs
+            if groups["batch"]:
+                out.append(("batched_matmul", lambda x, y: pair_contract(x, xs, y, ys, output)))
+            else:
+                out.append(("tensordot", lambda x, y: _tensordot(inputs, output, x, y)))
+                out.append(("matmul", lambda x, y: _matmul(inputs, output, x, y)))
+    return out
+
+
+def environment_key():
+    return f"numpy-{np.__version__}|{platform.machine()}|cpus-{os.cpu_count()}"
+
+
+class Autotuner:
+    """Times lowerings on first use of a key and remembers the winner."""
+
+    def __init__(self, path=None, min_time=0.05, max_repeats=20, slow_factor=5.0):
+        self.path = path or os.path.join(cache_dir(), CACHE_FILE)
+        self.min_time = min_time
+        self.max_repeats = max_repeats
+        self.slow_factor = slow_factor  # stop timing a candidate this much slower than the best
+        self.env = environment_key()
+        self._table = None
+        self._dispatch = {}  # key -> winning lowering, skips re-deriving it per call
+        self.stats = {"hits": 0, "tuned": 0}
+
+    @staticmethod
+    def key(subscripts, operands):
+        shapes = ",".join("x".join(map(str, np.shape(o))) for o in operands)
+        dtypes = ",".join(np.result_type(o).str for o in operands)
+        return f"{subscripts.replace(' ', '')}|{shapes}|{dtypes}"
+
+    def _load(self):
+        if self._table is None:
+            try:
+                with open(self.path) as f:
+                    self._table = json.load(f)
+            except (OSError, ValueError):
+                self._table = {}
+            self._table.setdefault(self.env, {})
+        return self._table[self.env]
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(self._table, f, indent=1)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            # tuning still applies to this process
+            print(f"warning: could not write autotune cache {self.path}: {e}", file=sys.stderr)
+
+    def _time(self, fn, operands, best):
+        samples = []
+        total = 0.0
+        while len(samples) < self.max_repeats and (len(samples) < 3 or total < self.min_time):
+            t0 = time.perf_counter()
+            fn(*operands)
+            dt = time.perf_counter() - t0
+            samples.append(dt)
+            total += dt
+            if best is not None and dt > self.slow_factor * best:
+                break
+        return min(samples)
+
+    def tune(self, subscripts, *operands):
+        """Time every applicable lowering for these operands and store the winner."""
+        inputs, output = parse_subscripts(subscripts, [np.ndim(o) for o in operands])
+        reference = None
+        timings = {}
+        best = None
+        error = None
+        # cheapest-to-try first so a slow naive einsum is cut short
+        for name, fn in sorted(candidates(subscripts, inputs, output), key=lambda c: c[0] == "einsum"):
+            try:
+                result = fn(*operands)
+            except Exception as e:
+                error = error or e
+                continue
+            if reference is None:
+                reference = result
+                tol = _tolerance(reference)
+            elif not np.allclose(result, reference, rtol=tol, atol=tol * np.max(np.abs(reference), initial=1.0)):
+                continue
+            timings[name] = self._time(fn, operands, best)
+            best = timings[name] if best is None else min(best, timings[name])
+        if not timings:
+            raise error  # every lowering failed: report the first real error (shape mismatch, ...)
+        winner = min(timings, key=timings.get)
+        self._load()[self.key(subscripts, operands)] = {"winner": winner, "timings": timings}
+        self._save()
+        self.stats["tuned"] += 1
+        return winner
+
+    def choice(self, subscripts, *operands):
+        entry = self._load().get(self.key(subscripts, operands))
+        return entry["winner"] if entry else None
+
+    def einsum(self, subscripts, *operands):
+        operands = [np.asarray(o) for o in operands]
+        key = self.key(subscripts, operands)
+        fn = self._dispatch.get(key)
+        if fn is None:
+            winner = self.choice(subscripts, *operands)
+            if winner is None:
+                winner = self.tune(subscripts, *operands)
+            else:
+                self.stats["hits"] += 1
+            inputs, output = parse_subscripts(subscripts, [o.ndim for o in operands])
+            fn = dict(candidates(subscripts, inputs, output)).get(
+                winner, lambda *ops: np.einsum(subscripts, *ops, optimize=True))
+            self._dispatch[key] = fn
+        else:
+            self.stats["hits"] += 1
+        return fn(*operands)
+
+
+_default = None
+
+
+def einsum(subscripts, *operands):
+    """numpy.einsum replacement dispatching to the fastest known lowering."""
+    global _default
+    if _default is None:
+        _default = Autotuner()
+    return _default.einsum(subscripts, *operands)
+
+
+def main():
+    rng = np.random.default_rng(0)
+    tuner = Autotuner()
+    cases = [
+        ("ij,jk->ik", [(512, 512), (512, 512)]),
+        ("ij,kj->ik", [(512, 256), (384, 256)]),
+        ("bij,bjk->bik", [(64, 32, 32), (64, 32, 32)]),
+        ("abc,cd->abd", [(32, 32, 64), (64, 48)]),
+        ("ab,bc,cd->ad", [(128, 128), (128, 8), (8, 128)]),
+    ]
+    print("Autotuned einsum; cache:", tuner.path)
+    for expr, shapes in cases:
+        ops = [rng.standard_normal(s).astype(np.float32) for s in shapes]
+        t0 = time.perf_counter()
+        tuner.einsum(expr, *ops)
+        first = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        tuner.einsum(expr, *ops)
+        again = time.perf_counter() - t0
+        entry = tuner._load()[tuner.key(expr, ops)]
+        timings = ", ".join(f"{k}={v * 1e3:.3f}ms" for k, v in sorted(entry["timings"].items(), key=lambda kv: kv[1]))
+        print(f"  {expr:14s} -> {entry['winner']:15s} first call {first:.4f} s, "
+              f"dispatched {again * 1e3:.3f} ms  [{timings}]")
+    print("  stats:", tuner.stats)
+
+
+if __name__ == "__main__":
+    main()
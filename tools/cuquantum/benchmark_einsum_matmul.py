@@ -1,89 +1,496 @@
 #!/usr/bin/env python3
 """
-Benchmark helper: compare numpy.einsum, cupy.einsum and cupy.matmul (cuBLAS).
-Run with venv activated that contains cupy.
+Benchmark suite: numpy.einsum / matmul / tensordot and any GPU backend that imports.
+
+Each kernel is timed after a configurable warmup with an adaptive number of
+repeats (keep sampling until --min-time has elapsed, between --min-repeats
+and --max-repeats). Reports median, IQR, min and GFLOP/s next to the
+predicted FLOP count and peak memory (contraction_guard), writes the run as
+JSON, and can compare a run against a stored baseline to flag regressions
+(e.g. after a numpy/BLAS upgrade). --sweep repeats the size ladder for a
+range of BLAS/OpenMP thread counts and reports parallel efficiency,
+GFLOP/s and achieved bandwidth against a measured roofline.
 
 Usage:
   . .cuq-venv/bin/activate
-  python3 benchmark_einsum_matmul.py
+  python3 benchmark_einsum_matmul.py                        # all importable kernels
+  python3 benchmark_einsum_matmul.py --list
+  python3 benchmark_einsum_matmul.py -k numpy.einsum numpy.matmul -s 512 1024 -o run.json
+  python3 benchmark_einsum_matmul.py --compare baseline.json          # fresh run vs baseline
+  python3 benchmark_einsum_matmul.py --compare baseline.json --current run.json
+  python3 benchmark_einsum_matmul.py --sweep --threads 1 2 4 8 -o sweep.json  # thread scaling
 """
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import tempfile
 import time
+from collections import OrderedDict
+
 import numpy as np
 
-sizes = [256, 512, 1024, 1536, 2048]  # adjust / reduce if out of memory
+sizes = [256, 512, 1024, 1536, 2048]  # adjust / reduce if out of memory (or use ooc.blocked_matmul)
 
-def time_numpy(n, repeats=3):
-    A = np.random.randn(n, n).astype(np.float32)
-    B = np.random.randn(n, n).astype(np.float32)
-    # warmup
-    C = np.einsum("ij,jk->ik", A, B)
-    t0 = time.perf_counter()
-    for _ in range(repeats):
-        C = np.einsum("ij,jk->ik", A, B)
-    dt = (time.perf_counter() - t0) / repeats
-    return dt
 
-def time_cupy_einsum(n, repeats=3):
-    try:
-        import cupy as cp
-    except Exception as e:
-        return None, f"cupy import failed: {e}"
-    A = cp.random.randn(n, n, dtype=cp.float32)
-    B = cp.random.randn(n, n, dtype=cp.float32)
-    # warmup
-    _ = cp.einsum("ij,jk->ik", A, B)
-    cp.cuda.Stream.null.synchronize()
-    t0 = time.perf_counter()
-    for _ in range(repeats):
-        _ = cp.einsum("ij,jk->ik", A, B)
+def _operands(n, dtype):
+    rng = np.random.default_rng(0)
+    A = rng.standard_normal((n, n)).astype(dtype)
+    B = rng.standard_normal((n, n)).astype(dtype)
+    return A, B
+
+
+# --- kernels -----------------------------------------------------------------
+# A kernel setup takes (n, dtype) and returns (run, flops) where run() performs
+# one complete timed call (including any device synchronization). Raising
+# ImportError marks the backend as unavailable on this machine.
+
+def numpy_einsum(n, dtype):
+    A, B = _operands(n, dtype)
+    return (lambda: np.einsum("ij,jk->ik", A, B)), 2.0 * n ** 3
+
+
+def numpy_einsum_optimize(n, dtype):
+    A, B = _operands(n, dtype)
+    return (lambda: np.einsum("ij,jk->ik", A, B, optimize=True)), 2.0 * n ** 3
+
+
+def numpy_matmul(n, dtype):
+    A, B = _operands(n, dtype)
+    return (lambda: A @ B), 2.0 * n ** 3
+
+
+def numpy_tensordot(n, dtype):
+    A, B = _operands(n, dtype)
+    return (lambda: np.tensordot(A, B, axes=1)), 2.0 * n ** 3
+
+
+def planner_contract(n, dtype):
+    from contraction_planner import contract
+    A, B = _operands(n, dtype)
+    return (lambda: contract("ij,jk->ik", A, B)), 2.0 * n ** 3
+
+
+def ooc_blocked_matmul(n, dtype):
+    # operands and result on disk; tile budget of one operand / 8 forces real tiling
+    from ooc_contract import blocked_matmul, open_output, random_memmap
+    tmp = tempfile.TemporaryDirectory()
+    A = random_memmap(os.path.join(tmp.name, "A.npy"), (n, n), dtype, seed=1)
+    B = random_memmap(os.path.join(tmp.name, "B.npy"), (n, n), dtype, seed=2)
+    C = open_output((n, n), dtype, os.path.join(tmp.name, "C.npy"))
+    budget = n * n * np.dtype(dtype).itemsize // 8
+
+    def run():
+        blocked_matmul(A, B, out=C, budget_bytes=budget)
+        run.tmp = tmp  # keep the directory alive as long as the kernel
+    return run, 2.0 * n ** 3
+
+
+def _cupy_operands(n, dtype):
+    import cupy as cp
+    A = cp.random.randn(n, n, dtype=dtype)
+    B = cp.random.randn(n, n, dtype=dtype)
+    return cp, A, B
+
+
+def cupy_einsum(n, dtype):
+    cp, A, B = _cupy_operands(n, dtype)
+
+    def run():
+        cp.einsum("ij,jk->ik", A, B)
         cp.cuda.Stream.null.synchronize()
-    dt = (time.perf_counter() - t0) / repeats
-    return dt, None
+    return run, 2.0 * n ** 3
 
-def time_cupy_matmul(n, repeats=3):
-    try:
-        import cupy as cp
-    except Exception as e:
-        return None, f"cupy import failed: {e}"
-    A = cp.random.randn(n, n, dtype=cp.float32)
-    B = cp.random.randn(n, n, dtype=cp.float32)
-    # warmup
-    _ = A @ B
-    cp.cuda.Stream.null.synchronize()
-    t0 = time.perf_counter()
-    for _ in range(repeats):
-        _ = A @ B
+
+def cupy_matmul(n, dtype):
+    cp, A, B = _cupy_operands(n, dtype)
+
+    def run():
+        A @ B
         cp.cuda.Stream.null.synchronize()
-    dt = (time.perf_counter() - t0) / repeats
-    return dt, None
+    return run, 2.0 * n ** 3
+
+
+def torch_matmul(n, dtype):
+    import torch
+    A, B = (torch.from_numpy(x) for x in _operands(n, dtype))
+    return (lambda: A @ B), 2.0 * n ** 3
+
+
+KERNELS = OrderedDict([
+    ("numpy.einsum", numpy_einsum),
+    ("numpy.einsum[optimize]", numpy_einsum_optimize),
+    ("numpy.matmul", numpy_matmul),
+    ("numpy.tensordot", numpy_tensordot),
+    ("planner.contract", planner_contract),
+    ("ooc.blocked_matmul", ooc_blocked_matmul),
+    ("cupy.einsum", cupy_einsum),
+    ("cupy.matmul", cupy_matmul),
+    ("torch.matmul", torch_matmul),
+])
+
+
+# every built-in kernel computes this contraction; its cost and memory are
+# predicted by contraction_guard.estimate and reported next to the timings
+KERNEL_EXPRESSION = "ij,jk->ik"
+
+
+def predicted(n, dtype):
+    from contraction_guard import estimate
+    est = estimate(KERNEL_EXPRESSION, [(n, n), (n, n)], [dtype, dtype])
+    return {k: est[k] for k in ("flops", "largest_intermediate_bytes", "peak_bytes")}
+
+
+# kernels whose backend is checked in the capability registry before any import
+KERNEL_BACKENDS = {"cupy.einsum": "cupy", "cupy.matmul": "cupy", "torch.matmul": "torch"}
+
+
+def _registry_unavailable(name):
+    backend = KERNEL_BACKENDS.get(name)
+    if backend is None:
+        return None
+    from capabilities import get_capabilities
+    info = get_capabilities().get(backend, {})
+    if info.get("available"):
+        return None
+    return info.get("error", f"{backend} not available (capability registry)")
+
 
-def main():
-    print("Benchmark: numpy.einsum vs cupy.einsum vs cupy.matmul (cuBLAS)")
-    print("Note: GPU times include synchronization; reduce sizes if OOM.")
+# --- measurement -------------------------------------------------------------
+
+def measure(run, warmup=1, min_repeats=5, max_repeats=200, min_time=0.5):
+    """Time run() until min_time seconds and min_repeats samples are collected."""
+    for _ in range(warmup):
+        run()
+    samples = []
+    total = 0.0
+    while len(samples) < max_repeats and (len(samples) < min_repeats or total < min_time):
+        t0 = time.perf_counter()
+        run()
+        dt = time.perf_counter() - t0
+        samples.append(dt)
+        total += dt
+    return samples
+
+
+def summarize(samples, flops=None):
+    s = np.asarray(samples)
+    q1, med, q3 = np.percentile(s, [25, 50, 75])
+    out = {
+        "repeats": int(s.size),
+        "median_s": float(med),
+        "q1_s": float(q1),
+        "q3_s": float(q3),
+        "iqr_s": float(q3 - q1),
+        "min_s": float(s.min()),
+        "mean_s": float(s.mean()),
+    }
+    if flops:
+        out["flops"] = float(flops)
+        out["gflops"] = float(flops / med / 1e9)
+    return out
+
+
+def environment_info():
+    info = {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "numpy": np.__version__,
+    }
     try:
-        import cupy as _cp
-        print("cupy available:", _cp.__version__)
+        from threadpoolctl import threadpool_info
+        info["blas"] = [{k: p.get(k) for k in ("internal_api", "version", "num_threads")}
+                        for p in threadpool_info()]
     except Exception:
-        print("cupy not available; install cupy-cuda12x in venv to run GPU tests.")
-    print()
+        pass
+    return info
+
+
+def run_suite(kernel_names, sizes, dtype="float32", warmup=1, min_repeats=5,
+              max_repeats=200, min_time=0.5, verbose=True):
+    results = []
     for n in sizes:
-        print(f"Size: {n}x{n}")
+        est = predicted(n, dtype)
+        if verbose:
+            print(f"Size: {n}x{n} ({dtype})  estimate: {est['flops']:.3g} flop, "
+                  f"peak {est['peak_bytes'] / 2**20:.1f} MiB")
+        for name in kernel_names:
+            rec = {"kernel": name, "n": n, "dtype": dtype, "estimate": est}
+            reason = _registry_unavailable(name)
+            if reason:
+                rec["skipped"] = reason
+                results.append(rec)
+                if verbose:
+                    print("  " + format_record(rec))
+                continue
+            try:
+                run, flops = KERNELS[name](n, dtype)
+                rec.update(summarize(measure(run, warmup, min_repeats, max_repeats, min_time), flops))
+            except ImportError as e:
+                rec["skipped"] = f"backend not importable: {e}"
+            except Exception as e:
+                rec["error"] = f"{type(e).__name__}: {e}"
+            results.append(rec)
+            if verbose:
+                print("  " + format_record(rec))
+        if verbose:
+            print("-" * 78)
+    return results
+
+
+def format_record(rec):
+    head = f"{rec['kernel']:24s}"
+    if "skipped" in rec:
+        return f"{head}: skipped ({rec['skipped']})"
+    if "error" in rec:
+        return f"{head}: failed: {rec['error']}"
+    line = (f"{head}: median {rec['median_s']:.6f} s  IQR {rec['iqr_s']:.2e}  "
+            f"min {rec['min_s']:.6f} s  {rec.get('gflops', 0):8.2f} GFLOP/s  (x{rec['repeats']})")
+    if "estimate" in rec:
+        line += f"  est. peak {rec['estimate']['peak_bytes'] / 2**20:.1f} MiB"
+    return line
+
+
+# --- thread scaling / roofline sweep ------------------------------------------
+
+SWEEP_KERNELS = ["numpy.einsum", "numpy.matmul"]
+
+
+def default_thread_counts():
+    n = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 < n:
+        counts.append(counts[-1] * 2)
+    if n > 1:
+        counts.append(n)
+    return counts
+
+
+def stream_triad(threads, mbytes=256, min_time=0.5):
+    """Measured memory bandwidth (bytes/s) of a = b + s*c split over `threads`.
+
+    numpy ufuncs are single-threaded, so the arrays are cut into one chunk
+    per thread and each chunk runs in a pool thread (ufuncs release the GIL).
+    Traffic counted: read b, read c, write a.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    n = int(mbytes * 2**20) // 3 // 8
+    a, b, c = np.zeros(n), np.ones(n), np.full(n, 2.0)
+    bounds = np.linspace(0, n, threads + 1).astype(int)
+    chunks = [(a[lo:hi], b[lo:hi], c[lo:hi]) for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+    def triad(chunk):
+        ca, cb, cc = chunk
+        np.multiply(cc, 3.0, out=ca)
+        np.add(ca, cb, out=ca)
+
+    with ThreadPoolExecutor(threads) as pool:
+        def run():
+            list(pool.map(triad, chunks))
+        med = summarize(measure(run, min_repeats=5, min_time=min_time))["median_s"]
+    return 3 * 8 * n / med
+
+
+def measure_roofline(threads, dtype, n_peak=2048, min_time=0.5):
+    """Compute roof from a large matmul, memory roof from the triad."""
+    run, flops = numpy_matmul(n_peak, dtype)
+    peak = flops / summarize(measure(run, min_repeats=3, min_time=min_time))["median_s"]
+    return {"threads": threads, "peak_gflops": peak / 1e9,
+            "bandwidth_gbs": stream_triad(threads, min_time=min_time) / 1e9}
+
+
+def run_sweep(kernel_names, sizes, thread_counts, dtype="float32", warmup=1, min_repeats=5,
+              max_repeats=200, min_time=0.5):
+    """Run the size ladder at every BLAS/OpenMP thread count.
+
+    For each kernel/size/thread count it records GFLOP/s, parallel
+    efficiency against the 1-thread run (always measured, even when 1 is
+    not in thread_counts), the achieved bandwidth counting the compulsory
+    traffic (read A and B, write C), and the fraction of the roofline bound
+    min(peak, intensity * bandwidth) measured at that thread count. The
+    compute peak always comes from an n = 2048 matmul, whatever the ladder.
+    """
+    from threadpoolctl import threadpool_limits
+    itemsize = np.dtype(dtype).itemsize
+    thread_counts = sorted({1, *thread_counts})  # the 1-thread run is the speedup baseline
+    roofs, results = [], []
+    base = {}
+    for t in thread_counts:
+        with threadpool_limits(limits=t):
+            roof = measure_roofline(t, dtype, min_time=min_time)
+            roofs.append(roof)
+            print(f"Threads: {t}  roofline: peak {roof['peak_gflops']:.1f} GFLOP/s, "
+                  f"bandwidth {roof['bandwidth_gbs']:.1f} GB/s")
+            for n in sizes:
+                for name in kernel_names:
+                    rec = {"kernel": name, "n": n, "dtype": dtype, "threads": t}
+                    reason = _registry_unavailable(name)
+                    if reason:
+                        rec["skipped"] = reason
+                    else:
+                        try:
+                            run, flops = KERNELS[name](n, dtype)
+                            rec.update(summarize(measure(run, warmup, min_repeats, max_repeats, min_time), flops))
+                        except ImportError as e:
+                            rec["skipped"] = f"backend not importable: {e}"
+                        except Exception as e:
+                            rec["error"] = f"{type(e).__name__}: {e}"
+                    results.append(rec)
+                    if "median_s" not in rec:
+                        print(f"  {format_record(rec)}  n={n}")
+                        continue
+                    traffic = 3 * n * n * itemsize
+                    intensity = flops / traffic
+                    bound = min(roof["peak_gflops"], intensity * roof["bandwidth_gbs"])
+                    if t == 1:
+                        base[(name, n)] = rec["median_s"]
+                    rec.update(bandwidth_gbs=traffic / rec["median_s"] / 1e9,
+                               intensity_flop_per_byte=intensity,
+                               roofline_gflops=bound,
+                               roofline_fraction=rec["gflops"] / bound)
+                    line = (f"  {name:24s} n={n:<5d} {rec['gflops']:8.2f} GFLOP/s  "
+                            f"{rec['bandwidth_gbs']:7.2f} GB/s  ")
+                    if (name, n) in base:  # no speedup when the 1-thread run failed
+                        rec["speedup"] = base[(name, n)] / rec["median_s"]
+                        rec["parallel_efficiency"] = rec["speedup"] / t
+                        line += f"x{rec['speedup']:5.2f} (eff {rec['parallel_efficiency']:4.0%})  "
+                    print(line + f"{rec['roofline_fraction']:5.1%} of roofline")
+        print("-" * 78)
+    best = {}
+    for r in results:
+        if "median_s" not in r:
+            continue
+        key = (r["kernel"], r["n"])
+        if key not in best or r["median_s"] < best[key]["median_s"]:
+            best[key] = r
+    print("Fastest thread count per kernel/size:")
+    for (name, n), r in best.items():
+        print(f"  {name:24s} n={n:<5d} -> {r['threads']} thread(s)")
+    return {"roofline": roofs, "results": results}
+
+
+# --- baseline comparison ------------------------------------------------------
+
+def compare(baseline, current, threshold=0.10):
+    """Flag kernels whose median got slower than baseline by more than threshold.
+
+    A slowdown only counts as a regression when the interquartile ranges do
+    not overlap either, so noisy kernels do not raise false alarms.
+    """
+    base = {(r["kernel"], r["n"], r["dtype"]): r for r in baseline["results"] if "median_s" in r}
+    rows = []
+    for r in current["results"]:
+        key = (r["kernel"], r["n"], r["dtype"])
+        if "median_s" not in r or key not in base:
+            continue
+        b = base[key]
+        ratio = r["median_s"] / b["median_s"]
+        regressed = ratio > 1.0 + threshold and r["q1_s"] > b["q3_s"]
+        improved = ratio < 1.0 - threshold and r["q3_s"] < b["q1_s"]
+        rows.append({"kernel": r["kernel"], "n": r["n"], "dtype": r["dtype"],
+                     "baseline_median_s": b["median_s"], "median_s": r["median_s"],
+                     "ratio": ratio,
+                     "status": "REGRESSION" if regressed else "improved" if improved else "ok"})
+    return rows
+
+
+def print_comparison(rows, threshold):
+    print(f"Comparison against baseline (threshold {threshold:.0%})")
+    for row in rows:
+        print(f"  {row['kernel']:24s} n={row['n']:<6d} {row['baseline_median_s']:.6f} s -> "
+              f"{row['median_s']:.6f} s  x{row['ratio']:.3f}  {row['status']}")
+    n_reg = sum(row["status"] == "REGRESSION" for row in rows)
+    print(f"{n_reg} regression(s) out of {len(rows)} comparable measurements.")
+    return n_reg
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    p.add_argument("-k", "--kernels", nargs="+", default=None,
+                   help="kernel names (see --list; default: all, or numpy einsum/matmul with --sweep)")
+    p.add_argument("-s", "--sizes", nargs="+", type=int, default=sizes)
+    p.add_argument("--dtype", default="float32")
+    p.add_argument("--warmup", type=int, default=1)
+    p.add_argument("--min-repeats", type=int, default=5)
+    p.add_argument("--max-repeats", type=int, default=200)
+    p.add_argument("--min-time", type=float, default=0.5, help="seconds of samples per kernel/size")
+    p.add_argument("-o", "--output", help="write the run as JSON to this path")
+    p.add_argument("--compare", metavar="BASELINE", help="baseline JSON to compare against")
+    p.add_argument("--current", help="compare this stored run instead of measuring a new one")
+    p.add_argument("--threshold", type=float, default=0.10, help="relative slowdown flagged as regression")
+    p.add_argument("--list", action="store_true", help="list kernels and whether they import")
+    p.add_argument("--sweep", action="store_true",
+                   help="vary BLAS/OpenMP threads and report scaling and roofline fraction")
+    p.add_argument("--threads", nargs="+", type=int, default=None,
+                   help="thread counts for --sweep (default: 1, 2, 4, ... cpu_count; 1 is always run as the baseline)")
+    args = p.parse_args(argv)
+    if args.kernels is None:
+        args.kernels = SWEEP_KERNELS if args.sweep else list(KERNELS)
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    unknown = [k for k in args.kernels if k not in KERNELS]
+    if unknown:
+        print("Unknown kernel(s):", ", ".join(unknown), "- available:", ", ".join(KERNELS))
+        return 2
+    if args.list:
+        for name, setup in KERNELS.items():
+            reason = _registry_unavailable(name)
+            try:
+                if reason:
+                    raise ImportError(reason)
+                setup(2, args.dtype)
+                status = "available"
+            except Exception as e:
+                status = f"unavailable ({type(e).__name__}: {e})"
+            print(f"{name:24s} {status}")
+        return 0
+
+    if args.sweep:
         try:
-            t_numpy = time_numpy(n)
-            print(f"  numpy.einsum     : {t_numpy:.6f} s")
-        except Exception as e:
-            print(f"  numpy.einsum     : failed: {e}")
-        t_cu_einsum, err = time_cupy_einsum(n)
-        if err:
-            print(f"  cupy.einsum      : {err}")
-        else:
-            print(f"  cupy.einsum      : {t_cu_einsum:.6f} s")
-        t_cu_matmul, err = time_cupy_matmul(n)
-        if err:
-            print(f"  cupy.matmul      : {err}")
-        else:
-            print(f"  cupy.matmul      : {t_cu_matmul:.6f} s")
-        print("-" * 60)
+            import threadpoolctl  # noqa: F401
+        except ImportError:
+            print("--sweep needs threadpoolctl to change BLAS threads at runtime (pip install threadpoolctl).")
+            return 2
+        threads = args.threads or default_thread_counts()
+        print(f"Thread sweep {threads} for: " + ", ".join(args.kernels))
+        sweep = run_sweep(args.kernels, args.sizes, threads, args.dtype, args.warmup,
+                          args.min_repeats, args.max_repeats, args.min_time)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump({"meta": environment_info(), "sweep": sweep}, f, indent=2)
+            print("Results written to", args.output)
+        return 0
+
+    if args.current:
+        with open(args.current) as f:
+            run = json.load(f)
+    else:
+        print("Benchmark: " + ", ".join(args.kernels))
+        print("Note: GPU times include synchronization; reduce sizes if OOM.")
+        print()
+        run = {"meta": environment_info(),
+               "config": {k: getattr(args, k) for k in ("warmup", "min_repeats", "max_repeats", "min_time")},
+               "results": run_suite(args.kernels, args.sizes, args.dtype, args.warmup,
+                                    args.min_repeats, args.max_repeats, args.min_time)}
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(run, f, indent=2)
+            print("Results written to", args.output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        n_reg = print_comparison(compare(baseline, run, args.threshold), args.threshold)
+        return 1 if n_reg else 0
+    return 0
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
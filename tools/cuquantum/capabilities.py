@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Cached backend capability registry for the cuQuantum / einsum scripts.
+
+Importing cupy / cuquantum and running nvidia-smi costs seconds on nodes
+without GPUs. This module probes once, records which backends and features
+are usable, and stores the answer on disk keyed by an environment
+fingerprint (interpreter, installed package versions, NVIDIA driver).
+Computing the fingerprint needs no imports and no subprocess, so later runs
+get the cached answer in milliseconds and only re-probe when the
+fingerprint changes.
+
+Cache location: $MATHSHPC_CACHE_DIR or ~/.cache/mathshpc-labs (the last
+MAX_CACHE_ENTRIES fingerprints are kept, so upgrades do not grow it forever)
+
+Usage:
+  python3 capabilities.py            # show (cached) capabilities
+  python3 capabilities.py --refresh  # force a new probe
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+from importlib import metadata
+
+CACHE_FILE = "capabilities.json"
+MAX_CACHE_ENTRIES = 8  # fingerprints kept (several venvs may share the cache dir); older ones are dropped
+
+# distributions whose versions decide whether a cached probe is still valid
+FINGERPRINT_PACKAGES = (
+    "numpy", "threadpoolctl", "torch",
+    "cupy", "cupy-cuda11x", "cupy-cuda12x", "cupy-cuda13x",
+    "cuquantum", "cuquantum-python", "cuquantum-python-cu11", "cuquantum-python-cu12",
+    "cuquantum-cu11", "cuquantum-cu12",
+)
+
+# einsum backends in order of preference
+EINSUM_BACKENDS = ("cuquantum.einsum", "cuquantum.cutensornet.einsum", "cupy.einsum", "planner")
+
+
+def cache_dir():
+    return os.environ.get("MATHSHPC_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "mathshpc-labs")
+
+
+def _driver_version():
+    try:
+        with open("/proc/driver/nvidia/version") as f:
+            return f.readline().strip()
+    except OSError:
+        return None
+
+
+def fingerprint():
+    packages = {}
+    for name in FINGERPRINT_PACKAGES:
+        try:
+            packages[name] = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            pass
+    return {
+        "python": sys.executable,
+        "python_version": platform.python_version(),
+        "machine": platform.machine(),
+        "packages": packages,
+        "nvidia_driver": _driver_version(),
+        "cuda_visible_devices": os.environ.get("CUDA_VISIBLE_DEVICES"),
+    }
+
+
+def fingerprint_key(fp):
+    return hashlib.sha256(json.dumps(fp, sort_keys=True).encode()).hexdigest()[:16]
+
+
+# --- probing -----------------------------------------------------------------
+
+def _probe_numpy(caps):
+    import numpy as np
+    caps["numpy"] = {"available": True, "version": np.__version__}
+    try:
+        from threadpoolctl import threadpool_info
+        caps["numpy"]["blas"] = sorted({p.get("internal_api", "?") for p in threadpool_info()})
+    except ImportError:
+        pass
+
+
+def _probe_cupy(caps):
+    info = {"available": False}
+    try:
+        import cupy as cp
+        info["version"] = cp.__version__
+        n = cp.cuda.runtime.getDeviceCount()
+        devices = []
+        for d in range(n):
+            props = cp.cuda.runtime.getDeviceProperties(d)
+            name = props.get("name", b"")
+            devices.append({"name": name.decode() if isinstance(name, bytes) else name,
+                            "compute_capability": f"{props.get('major')}.{props.get('minor')}",
+                            "total_memory": props.get("totalGlobalMem")})
+        info["devices"] = devices
+        info["available"] = n > 0
+    except Exception as e:
+        info["error"] = f"{type(e).__name__}: {e}"
+    caps["cupy"] = info
+
+
+def _probe_cuquantum(caps):
+    info = {"available": False}
+    try:
+        import cuquantum as cq
+        info["available"] = True
+        info["version"] = getattr(cq, "__version__", None)
+        info["einsum"] = hasattr(cq, "einsum")
+        for sub in ("cutensornet", "custatevec"):
+            try:
+                mod = __import__(f"cuquantum.{sub}", fromlist=[sub])
+                info[sub] = {"available": True,
+                             "einsum": hasattr(mod, "einsum"),
+                             "contract": hasattr(mod, "contract")}
+            except Exception as e:
+                info[sub] = {"available": False, "error": f"{type(e).__name__}: {e}"}
+    except Exception as e:
+        info["error"] = f"{type(e).__name__}: {e}"
+    caps["cuquantum"] = info
+
+
+def _probe_torch(caps):
+    info = {"available": False}
+    try:
+        import torch
+        info.update(available=True, version=torch.__version__, cuda=bool(torch.cuda.is_available()))
+    except Exception as e:
+        info["error"] = f"{type(e).__name__}: {e}"
+    caps["torch"] = info
+
+
+def _probe_nvidia_smi(caps):
+    info = {"available": shutil.which("nvidia-smi") is not None}
+    if info["available"]:
+        try:
+            out = subprocess.check_output(
+                ["nvidia-smi", "--query-gpu=name,driver_version,compute_cap", "--format=csv,noheader"],
+                text=True, timeout=20)
+            info["gpus"] = [line.strip() for line in out.splitlines() if line.strip()]
+        except Exception as e:
+            info["error"] = f"{type(e).__name__}: {e}"
+    caps["nvidia_smi"] = info
+
+
+def probe():
+    """Import every backend once and record what works (slow path)."""
+    caps = {}
+    t0 = time.perf_counter()
+    for step in (_probe_numpy, _probe_nvidia_smi, _probe_cupy, _probe_cuquantum, _probe_torch):
+        step(caps)
+    # cutensornet optimizations are NOT_SUPPORTED below compute capability 7.0
+    devices = caps["cupy"].get("devices", [])
+    cc_ok = any(float(d["compute_capability"]) >= 7.0 for d in devices
+                if d["compute_capability"] not in (None, "None.None"))
+    cq = caps["cuquantum"]
+    gpu = caps["cupy"]["available"]
+    caps["einsum_backends"] = {
+        "cuquantum.einsum": bool(cq["available"] and cq.get("einsum") and gpu),
+        "cuquantum.cutensornet.einsum": bool(cq["available"] and gpu and cc_ok
+                                             and cq.get("cutensornet", {}).get("einsum")),
+        "cupy.einsum": gpu,
+        "planner": caps["numpy"]["available"],
+    }
+    caps["probe_seconds"] = round(time.perf_counter() - t0, 3)
+    return caps
+
+
+# --- cache -------------------------------------------------------------------
+
+def _load_cache(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def get_capabilities(refresh=False):
+    """Cached capabilities for the current environment (probing on a miss)."""
+    fp = fingerprint()
+    key = fingerprint_key(fp)
+    path = os.path.join(cache_dir(), CACHE_FILE)
+    cache = _load_cache(path)
+    entry = cache.get(key)
+    if entry is not None and not refresh:
+        return entry["capabilities"]
+    caps = probe()
+    cache.pop(key, None)  # re-inserted last: entries stay in probe order
+    cache[key] = {"fingerprint": fp, "probed_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "capabilities": caps}
+    while len(cache) > MAX_CACHE_ENTRIES:  # drop the environments probed longest ago
+        del cache[next(iter(cache))]
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(cache, f, indent=2)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"warning: could not write capability cache {path}: {e}", file=sys.stderr)
+    return caps
+
+
+def has(feature, caps=None):
+    """has('cupy'), has('cuquantum.cutensornet'), has('einsum_backends.cupy.einsum') ..."""
+    node = caps if caps is not None else get_capabilities()
+    if feature.startswith("einsum_backends."):
+        return bool(node["einsum_backends"].get(feature[len("einsum_backends."):]))
+    for part in feature.split("."):
+        if not isinstance(node, dict) or part not in node:
+            return False
+        node = node[part]
+    return bool(node.get("available")) if isinstance(node, dict) else bool(node)
+
+
+def select_einsum_backend(caps=None):
+    """Best usable einsum backend name, from the cache (no import attempts)."""
+    caps = caps if caps is not None else get_capabilities()
+    for name in EINSUM_BACKENDS:
+        if caps["einsum_backends"].get(name):
+            return name
+    return "planner"
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Show the cached backend capability registry")
+    p.add_argument("--refresh", action="store_true", help="ignore the cache and probe again")
+    args = p.parse_args(argv)
+    t0 = time.perf_counter()
+    caps = get_capabilities(refresh=args.refresh)
+    dt = time.perf_counter() - t0
+    print(f"Capabilities ({dt * 1e3:.1f} ms; last probe took {caps['probe_seconds']} s)")
+    print("Cache:", os.path.join(cache_dir(), CACHE_FILE), "key", fingerprint_key(fingerprint()))
+    print(json.dumps(caps, indent=2))
+    print("Selected einsum backend:", select_einsum_backend(caps))
+
+
+if __name__ == "__main__":
+    main()
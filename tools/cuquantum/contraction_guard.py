@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Peak-memory estimator and execution guard for einsum contractions.
+
+estimate() predicts, before anything runs, the FLOP count, the largest
+intermediate and the peak resident memory of a contraction for its
+subscripts, shapes, dtypes and contraction order (the planner's path by
+default). guarded_contract() compares that estimate with a memory budget
+and either runs the contraction normally, switches to a sliced
+(sliced_contract) or out-of-core blocked (ooc_contract) strategy, or
+refuses with MemoryError, so an oversized einsum cannot take down a shared
+node.
+
+The budget defaults to $MATHSHPC_MEM_BUDGET (bytes, or with a K/M/G/T
+suffix) and otherwise to half of the physical memory.
+
+Usage:
+  python3 contraction_guard.py "abc,cd,de->abe" 64,64,64 64,64 64,64
+  MATHSHPC_MEM_BUDGET=256M python3 contraction_guard.py "ab,bc->ac" 8192,8192 8192,8192
+"""
+import os
+import sys
+
+import numpy as np
+
+from contraction_planner import ContractionPlan, contract, get_plan_for_shapes, index_sizes, parse_subscripts
+
+_UNITS = {"": 1, "K": 2**10, "M": 2**20, "G": 2**30, "T": 2**40}
+
+
+def parse_bytes(text):
+    """'512M' -> 536870912; plain integers are bytes."""
+    text = str(text).strip().upper().rstrip("B")
+    unit = text[-1:] if text[-1:] in _UNITS else ""
+    return int(float(text[:len(text) - len(unit)]) * _UNITS[unit])
+
+
+def default_budget():
+    env = os.environ.get("MATHSHPC_MEM_BUDGET")
+    if env:
+        return parse_bytes(env)
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // 2
+    except (ValueError, OSError, AttributeError):
+        return 4 * 2**30
+
+
+def _nbytes(term, sizes, itemsize):
+    n = 1
+    for c in term:
+        n *= sizes[c]
+    return n * itemsize
+
+
+def estimate(subscripts, shapes, dtypes, path=None, optimize="auto"):
+    """Predict cost and memory of a contraction without running it.
+
+    Peak memory counts the operands, every intermediate still alive at a
+    given step, the step's result, and the transposed copies of the two
+    step inputs that the matmul lowering makes.
+    """
+    shapes = [tuple(s) for s in shapes]
+    inputs, output = parse_subscripts(subscripts, [len(s) for s in shapes])
+    sizes = index_sizes(inputs, shapes)
+    itemsize = np.result_type(*dtypes).itemsize
+    if path is None:
+        plan = get_plan_for_shapes(subscripts, shapes, dtypes, optimize)
+    else:
+        plan = ContractionPlan(inputs, output, sizes, path, "given")
+
+    operand_bytes = sum(_nbytes(t, sizes, itemsize) for t in inputs)
+    terms = [(t, False) for t in inputs]  # (subscripts, is_intermediate)
+    live = 0  # bytes of intermediates currently alive
+    peak = operand_bytes
+    largest = 0
+    for i, j, xs, ys, rs in plan.steps:
+        rbytes = _nbytes(rs, sizes, itemsize)
+        workspace = _nbytes(xs, sizes, itemsize) + _nbytes(ys, sizes, itemsize)
+        peak = max(peak, operand_bytes + live + rbytes + workspace)
+        largest = max(largest, rbytes)
+        live += rbytes - sum(_nbytes(t, sizes, itemsize) for k, (t, inter) in enumerate(terms)
+                             if k in (i, j) and inter)
+        terms = [tt for k, tt in enumerate(terms) if k not in (i, j)] + [(rs, True)]
+    output_bytes = _nbytes(output, sizes, itemsize)
+    peak = max(peak, operand_bytes + live + output_bytes)
+    return {
+        "subscripts": subscripts,
+        "path": plan.path,
+        "flops": float(plan.flops),
+        "operand_bytes": operand_bytes,
+        "output_bytes": output_bytes,
+        "largest_intermediate_bytes": largest,
+        "peak_bytes": peak,
+    }
+
+
+def estimate_for(subscripts, *operands, optimize="auto"):
+    return estimate(subscripts, [np.shape(o) for o in operands],
+                    [np.result_type(o) for o in operands], optimize=optimize)
+
+
+def guarded_contract(subscripts, *operands, memory_budget=None, on_exceed="auto",
+                     n_workers=None, out_path=None, optimize="auto", verbose=False):
+    """Contract only if the estimated peak fits in memory_budget bytes.
+
+    on_exceed decides what happens otherwise:
+      "raise"   -> MemoryError with the estimate
+      "slice"   -> sliced_contract within the memory left after operands and output
+      "blocked" -> ooc_contract.blocked_einsum into a memmap (two operands)
+      "auto"    -> "slice" if a slicing fits, else "blocked" if the
+                   expression allows it, else raise
+    """
+    budget = default_budget() if memory_budget is None else parse_bytes(memory_budget)
+    est = estimate_for(subscripts, *operands, optimize=optimize)
+    if est["peak_bytes"] <= budget:
+        return contract(subscripts, *operands, optimize=optimize)
+
+    def refuse(reason):
+        return MemoryError(f"{subscripts}: estimated peak {est['peak_bytes'] / 2**20:.1f} MiB "
+                           f"exceeds budget {budget / 2**20:.1f} MiB ({reason}); "
+                           f"flops={est['flops']:.3g}, largest intermediate "
+                           f"{est['largest_intermediate_bytes'] / 2**20:.1f} MiB")
+
+    if on_exceed not in ("auto", "slice", "blocked", "raise"):
+        raise ValueError(f"unknown on_exceed {on_exceed!r}")
+    if on_exceed == "raise":
+        raise refuse("refused")
+
+    errors = []
+    if on_exceed in ("auto", "slice"):
+        from sliced_contract import plan_slices, sliced_contract
+        n_workers = n_workers or os.cpu_count() or 1
+        room = budget - est["operand_bytes"] - est["output_bytes"]
+        try:
+            if room <= 0:
+                raise MemoryError("operands and output alone exceed the budget")
+            sp = plan_slices(subscripts, [np.shape(o) for o in operands], np.result_type(*operands),
+                             room, n_workers, optimize)
+            if verbose:
+                print(f"guard: peak {est['peak_bytes']} B > budget {budget} B -> {sp}")
+            return sliced_contract(subscripts, *operands, n_workers=n_workers, slice_plan=sp)
+        except MemoryError as e:
+            errors.append(f"slicing: {e}")
+    if on_exceed in ("auto", "blocked") and len(operands) == 2:
+        from ooc_contract import blocked_einsum
+        room = budget - est["operand_bytes"] if not all(isinstance(o, np.memmap) for o in operands) else budget
+        try:
+            if room <= 0:
+                raise MemoryError("in-memory operands alone exceed the budget")
+            if verbose:
+                print(f"guard: peak {est['peak_bytes']} B > budget {budget} B -> blocked out-of-core")
+            return blocked_einsum(subscripts, *operands, budget_bytes=room, out_path=out_path)
+        except (MemoryError, ValueError) as e:
+            errors.append(f"blocked: {e}")
+    raise refuse("; ".join(errors) or "no fallback strategy applies")
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) < 2:
+        print(__doc__)
+        return 2
+    subscripts = argv[0]
+    shapes = [tuple(int(d) for d in s.split(",")) for s in argv[1:]]
+    est = estimate(subscripts, shapes, [np.float64] * len(shapes))
+    budget = default_budget()
+    print(f"Contraction {subscripts} with shapes {shapes} (float64)")
+    print(f"  path                      : {est['path']}")
+    print(f"  flops                     : {est['flops']:.4g}")
+    print(f"  operands                  : {est['operand_bytes'] / 2**20:.2f} MiB")
+    print(f"  largest intermediate      : {est['largest_intermediate_bytes'] / 2**20:.2f} MiB")
+    print(f"  estimated peak            : {est['peak_bytes'] / 2**20:.2f} MiB")
+    print(f"  budget                    : {budget / 2**20:.2f} MiB -> "
+          f"{'fits' if est['peak_bytes'] <= budget else 'guard will slice / block / refuse'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
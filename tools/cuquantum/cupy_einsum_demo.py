@@ -4,14 +4,19 @@ cupy_einsum_demo.py
 
 Comparer cupy.einsum (GPU) et numpy.einsum (CPU) sur une petite matrice.
 Exécuter avec le venv (.cuq-venv) activé.
+cupy n'est importé que si le registre de capacités (capabilities.py) l'a
+trouvé utilisable lors d'une sonde précédente.
 """
 import time
 import numpy as np
 
-try:
+from capabilities import get_capabilities
+
+_caps = get_capabilities()
+if _caps["einsum_backends"].get("cupy.einsum"):
     import cupy as cp
-except Exception as e:
-    print("cupy import failed:", type(e).__name__, e)
+else:
+    print("cupy not usable here:", _caps["cupy"].get("error", "no CUDA device"))
     print("Install cupy-cuda12x in the venv if you want GPU acceleration.")
     cp = None
 
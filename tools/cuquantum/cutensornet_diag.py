@@ -4,11 +4,25 @@ Diagnostic for cuQuantum / cutensornet NOT_SUPPORTED error.
 
 Run with the cuquantum venv activated:
   . .cuq-venv/bin/activate
-  python3 cutensornet_diag.py
+  python3 cutensornet_diag.py            # uses the cached capability probe
+  python3 cutensornet_diag.py --full     # always run every check below
+  python3 cutensornet_diag.py --refresh  # re-probe and update the cache
 """
 import subprocess, sys, traceback
 
+from capabilities import get_capabilities, select_einsum_backend
+
 print("Python:", sys.version)
+
+caps = get_capabilities(refresh="--refresh" in sys.argv)
+print("Cached capabilities: cupy={} cuquantum={} nvidia-smi={} -> einsum backend: {}".format(
+    caps["cupy"]["available"], caps["cuquantum"]["available"], caps["nvidia_smi"]["available"],
+    select_einsum_backend(caps)))
+if not (caps["cupy"]["available"] or caps["cuquantum"]["available"] or caps["nvidia_smi"]["available"]) \
+        and "--full" not in sys.argv:
+    print("No GPU stack found by the cached probe (re-probed automatically when packages or driver change).")
+    print("Run with --full to repeat every check, or use the CPU stand-in: sliced_contract.py")
+    sys.exit(0)
 print("\n--- nvidia-smi output ---")
 try:
     out = subprocess.check_output(["nvidia-smi"], text=True)
@@ -68,4 +82,5 @@ print("\n--- End of diagnostic ---")
 print("Next suggestions:")
 print("  * If compute capability < 7.0 (Pascal/6.x), cutensornet optimizations may be unsupported on this GPU.")
 print("  * You can continue using numpy fallback or use custatevec APIs if they suit your needs.")
+print("  * CPU stand-in for cutensornet (path optimization + index slicing on all cores): sliced_contract.py")
 print("  * For GPU acceleration, consider a more recent NVIDIA GPU (Turing/Ampere) or run on a machine/container with a supported architecture.")
\ No newline at end of file
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Out-of-core blocked matmul / einsum over memory-mapped operands.
+
+Operands that do not fit in RAM are stored as np.memmap (e.g. .npy files
+opened with np.load(..., mmap_mode="r")). The product is computed tile by
+tile: each step reads one tile of A and one of B into RAM, multiplies them
+with BLAS and accumulates into an output tile, which is then written to a
+memmap output. Tile sizes are derived from a memory budget so the resident
+working set never exceeds it.
+
+Usage:
+  python3 ooc_contract.py                          # benchmark vs in-core matmul
+  python3 ooc_contract.py -n 4096 8192 --budget-mb 256 --dir /scratch/$USER
+"""
+import argparse
+import math
+import os
+import tempfile
+
+import numpy as np
+
+DEFAULT_BUDGET = 512 * 2**20  # bytes
+TILE_ALIGN = 64
+
+
+def _align(t, limit):
+    if t >= limit:
+        return limit
+    if t >= TILE_ALIGN:
+        return t // TILE_ALIGN * TILE_ALIGN
+    return max(1, t)
+
+
+def choose_tiles(M, N, K, itemsize, budget_bytes=DEFAULT_BUDGET):
+    """Pick (tm, tn, tk) so that A, B, product and accumulator tiles fit the budget.
+
+    Resident set per step: A tile (tm*tk) + B tile (tk*tn) + product and
+    accumulator tiles (2*tm*tn). Output tiles are the expensive reuse factor
+    (A is re-read N/tn times, B M/tm times), so tm = tn is made as large as
+    possible and tk takes what is left.
+    """
+    elems = budget_bytes // itemsize
+    if elems < 4:
+        raise ValueError(f"memory budget of {budget_bytes} bytes is too small")
+    # with tm = tn = tk = t the working set is 4 t^2
+    t = int(math.sqrt(elems / 4))
+    tk = _align(min(K, t), K)
+    # grow the output tile with whatever tk leaves unused: 2 t^2 + 2 t tk <= elems
+    t_out = int((-2 * tk + math.sqrt(4 * tk * tk + 8 * elems)) / 4)
+    tm = _align(min(M, t_out), M)
+    tn = _align(min(N, t_out), N)
+    # give back leftovers to the other output dimension when one side is small
+    if tm == M and tn < N:
+        tn = _align(min(N, (elems - tm * tk) // (tk + 2 * tm)), N)
+    elif tn == N and tm < M:
+        tm = _align(min(M, (elems - tn * tk) // (tk + 2 * tn)), M)
+    return max(1, tm), max(1, tn), max(1, tk)
+
+
+def open_output(shape, dtype, out_path=None, directory=None):
+    """Create a .npy-backed memmap for the result (temporary file if no path).
+
+    A temporary file is unlinked as soon as it is mapped: the mapping keeps
+    the data until the array is released, and nothing is left in the temp
+    directory afterwards. Pass out_path to keep the result on disk.
+    """
+    if out_path is not None:
+        return np.lib.format.open_memmap(out_path, mode="w+", dtype=dtype, shape=shape)
+    fd, path = tempfile.mkstemp(suffix=".npy", dir=directory)
+    os.close(fd)
+    try:
+        out = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+    finally:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass  # Windows cannot unlink a mapped file; it stays in the temp directory
+    return out
+
+
+def blocked_matmul(A, B, out=None, budget_bytes=DEFAULT_BUDGET, out_path=None, tiles=None):
+    """C = A @ B for 2-D operands, streaming tiles through budget_bytes of RAM.
+
+    A and B may be any array-likes supporting 2-D slicing (np.memmap,
+    transposed memmap views, ndarray). The result is written into `out`,
+    or a new memmap at out_path (an unlinked temporary file if not given).
+    """
+    M, K = A.shape
+    K2, N = B.shape
+    if K != K2:
+        raise ValueError(f"inner dimensions differ: {A.shape} @ {B.shape}")
+    dtype = np.result_type(A.dtype, B.dtype)
+    if out is None:
+        out = open_output((M, N), dtype, out_path)
+    elif out.shape != (M, N):
+        raise ValueError(f"out has shape {out.shape}, expected {(M, N)}")
+    tm, tn, tk = tiles or choose_tiles(M, N, K, dtype.itemsize, budget_bytes)
+
+    acc = np.empty((tm, tn), dtype=dtype)
+    prod = np.empty((tm, tn), dtype=dtype)
+    for i in range(0, M, tm):
+        mi = min(tm, M - i)
+        for j in range(0, N, tn):
+            nj = min(tn, N - j)
+            c = acc[:mi, :nj]
+            c[...] = 0
+            for k in range(0, K, tk):
+                kk = min(tk, K - k)
+                a = np.ascontiguousarray(A[i:i + mi, k:k + kk], dtype=dtype)
+                b = np.ascontiguousarray(B[k:k + kk, j:j + nj], dtype=dtype)
+                np.matmul(a, b, out=prod[:mi, :nj])
+                c += prod[:mi, :nj]
+            out[i:i + mi, j:j + nj] = c
+    if isinstance(out, np.memmap):
+        out.flush()
+    return out
+
+
+def _matrix_view(arr, rows, cols):
+    """Reshape a (possibly transposed) memmap to 2-D without reading it."""
+    try:
+        return np.reshape(arr, (rows, cols), copy=False)
+    except ValueError:
+        raise ValueError("operand axes are not laid out contiguously for this expression; "
+                         "an out-of-core reshape would need a full copy") from None
+
+
+def blocked_einsum(subscripts, A, B, out=None, budget_bytes=DEFAULT_BUDGET, out_path=None):
+    """Two-operand einsum evaluated out of core as a blocked matmul.
+
+    Supports expressions without batch indices ('ij,jk->ik', 'ji,jk->ik',
+    'abc,cd->abd', ...) whose output lists A's free indices then B's (or
+    B's then A's). Transposed operands are handled through strided views;
+    the free and contracted indices of each operand must remain groupable
+    without copying the memmap.
+    """
+    from contraction_planner import parse_subscripts, index_sizes
+    (xs, ys), rs = parse_subscripts(subscripts, [A.ndim, B.ndim])
+    sizes = index_sizes([xs, ys], [A.shape, B.shape])
+    inner = [c for c in xs if c in ys]
+    if any(c in rs for c in inner) or len(set(xs + ys)) != len(set(xs)) + len(set(ys)) - len(inner):
+        raise ValueError(f"'{subscripts}' has batch or repeated indices; not supported out of core")
+    fx = [c for c in xs if c not in ys]
+    fy = [c for c in ys if c not in xs]
+    if sorted(rs) != sorted(fx + fy):
+        raise ValueError(f"'{subscripts}' sums over a free index; not supported out of core")
+    if rs == "".join(fy + fx):
+        # C^T layout: swap the roles of A and B
+        A, B, xs, ys, fx, fy = B, A, ys, xs, fy, fx
+    elif rs != "".join(fx + fy):
+        raise ValueError(f"output '{rs}' must list one operand's free indices before the other's")
+
+    def size(g):
+        return int(np.prod([sizes[c] for c in g], dtype=np.int64))
+
+    a2 = _matrix_view(A.transpose([xs.index(c) for c in fx + inner]), size(fx), size(inner))
+    b2 = _matrix_view(B.transpose([ys.index(c) for c in inner + fy]), size(inner), size(fy))
+    dtype = np.result_type(A.dtype, B.dtype)
+    shape = tuple(sizes[c] for c in rs)
+    if out is None:
+        out = open_output(shape, dtype, out_path)
+    blocked_matmul(a2, b2, out=_matrix_view(out, size(fx), size(fy)), budget_bytes=budget_bytes)
+    if isinstance(out, np.memmap):
+        out.flush()
+    return out
+
+
+def random_memmap(path, shape, dtype=np.float32, chunk_rows=1024, seed=0):
+    """Write a random .npy memmap of the given shape in row chunks."""
+    rng = np.random.default_rng(seed)
+    mm = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+    for r in range(0, shape[0], chunk_rows):
+        mm[r:r + chunk_rows] = rng.standard_normal((min(chunk_rows, shape[0] - r),) + shape[1:]).astype(dtype)
+    mm.flush()
+    return np.load(path, mmap_mode="r")
+
+
+def main(argv=None):
+    from benchmark_einsum_matmul import measure, summarize
+
+    p = argparse.ArgumentParser(description="Out-of-core blocked matmul benchmark")
+    p.add_argument("-n", "--sizes", nargs="+", type=int, default=[1024, 2048, 4096])
+    p.add_argument("--budget-mb", type=float, default=None,
+                   help="RAM budget for tiles (default: one operand / 8, to force tiling)")
+    p.add_argument("--dtype", default="float32")
+    p.add_argument("--dir", default=None, help="directory for the memmap files")
+    p.add_argument("--min-time", type=float, default=1.0)
+    p.add_argument("--skip-incore", action="store_true", help="only time the out-of-core path")
+    args = p.parse_args(argv)
+    dtype = np.dtype(args.dtype)
+
+    print("Out-of-core blocked matmul vs in-core numpy.matmul (warm page cache)")
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        for n in args.sizes:
+            flops = 2.0 * n ** 3
+            budget = int(args.budget_mb * 2**20) if args.budget_mb else n * n * dtype.itemsize // 8
+            A = random_memmap(os.path.join(tmp, f"A{n}.npy"), (n, n), dtype, seed=1)
+            B = random_memmap(os.path.join(tmp, f"B{n}.npy"), (n, n), dtype, seed=2)
+            C = open_output((n, n), dtype, os.path.join(tmp, f"C{n}.npy"))
+            tiles = choose_tiles(n, n, n, dtype.itemsize, budget)
+            print(f"Size: {n}x{n}  budget {budget / 2**20:.1f} MiB  tiles (tm, tn, tk) = {tiles}")
+            ooc = summarize(measure(lambda: blocked_matmul(A, B, out=C, tiles=tiles),
+                                    min_repeats=3, min_time=args.min_time), flops)
+            print(f"  blocked memmap : median {ooc['median_s']:.6f} s  {ooc['gflops']:8.2f} GFLOP/s")
+            if not args.skip_incore:
+                a, b = np.asarray(A), np.asarray(B)
+                ref = summarize(measure(lambda: a @ b, min_repeats=3, min_time=args.min_time), flops)
+                print(f"  in-core matmul : median {ref['median_s']:.6f} s  {ref['gflops']:8.2f} GFLOP/s"
+                      f"  (out-of-core at {ooc['gflops'] / ref['gflops']:.0%})")
+                err = np.max(np.abs(np.asarray(C) - a @ b)) / max(1.0, np.max(np.abs(a @ b)))
+                print(f"  rel. max error : {err:.2e}")
+            del A, B, C
+            print("-" * 70)
+    return 0
+
+
+if __name__ == "__main__":
+    main()
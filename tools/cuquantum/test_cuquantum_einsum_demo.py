@@ -3,27 +3,31 @@
 Minimal einsum/contraction demo:
 - Try cuquantum.einsum
 - Fallback to cuquantum.cutensornet.einsum if present
-- Final fallback: numpy.einsum
+- Final fallback: CPU contraction planner (contraction_planner.contract),
+  which orders pairwise contractions and caches the plan per network shape
 
-This is safe: the script first checks available symbols and prints which backend is used.
+This is safe: the backend is picked from the cached capability registry
+(capabilities.py), so cuquantum is only imported when a previous probe found
+a usable einsum; the script prints which backend is used.
 """
 import time
 import numpy as np
 
+from capabilities import select_einsum_backend
+from contraction_planner import contract, get_plan, plan_cache_info
+
 def try_cuquantum_einsum(A, B):
+    backend = select_einsum_backend()
+    if not backend.startswith("cuquantum"):
+        return ("no-cq-einsum", None, None)
     try:
         import cuquantum as cq
-        # prefer top-level einsum if present
-        if hasattr(cq, "einsum"):
-            t0 = time.time()
+        t0 = time.time()
+        if backend == "cuquantum.einsum":
             C = cq.einsum("ij,jk->ik", A, B)
-            return ("cuquantum.einsum", C, time.time() - t0)
-        # else try cutensornet.einsum if present
-        if hasattr(cq, "cutensornet") and hasattr(cq.cutensornet, "einsum"):
-            t0 = time.time()
+        else:
             C = cq.cutensornet.einsum("ij,jk->ik", A, B)
-            return ("cuquantum.cutensornet.einsum", C, time.time() - t0)
-        return ("no-cq-einsum", None, None)
+        return (backend, C, time.time() - t0)
     except Exception as e:
         return ("cq-import-failed", e, None)
 
@@ -43,16 +47,27 @@ def main():
         except Exception:
             print("Result is not directly convertible to numpy array (possibly GPU-backed).")
     elif tag == "no-cq-einsum":
-        print("cuQuantum einsum not available, falling back to numpy.einsum")
-        t0 = time.time()
-        C = np.einsum("ij,jk->ik", A, B)
-        print("Used numpy.einsum, time: {:.6f}s, shape: {}".format(time.time() - t0, C.shape))
+        print("cuQuantum einsum not available, falling back to the CPU planner")
+        run_cpu_fallback(A, B)
     else:
         print("cuQuantum import/usage failed:", result)
-        print("Falling back to numpy.einsum")
+        print("Falling back to the CPU planner")
+        run_cpu_fallback(A, B)
+
+def run_cpu_fallback(A, B):
+    t0 = time.time()
+    C = contract("ij,jk->ik", A, B)
+    print("Used contraction_planner.contract, time: {:.6f}s, shape: {}".format(time.time() - t0, C.shape))
+
+    # multi-operand network: this is where ordering matters
+    expr = "ab,bc,cd,de,ea->"
+    ops = [np.random.randn(32, 32).astype(np.float32) for _ in range(5)]
+    for label in ("first call", "cached plan"):
         t0 = time.time()
-        C = np.einsum("ij,jk->ik", A, B)
-        print("Used numpy.einsum, time: {:.6f}s, shape: {}".format(time.time() - t0, C.shape))
+        contract(expr, *ops)
+        print(f"  {expr} ({label}): {time.time() - t0:.6f}s")
+    print(" ", get_plan(expr, *ops))
+    print("  plan cache:", plan_cache_info())
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
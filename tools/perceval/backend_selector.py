@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Benchmarked Perceval backend selection, remembered on disk.
+
+Scripts used to try several backend names and simulator call signatures
+on every run, each failure going through an exception. BackendSelector
+does that discovery once: for every backend the factory lists (plus the
+in-repo slos.SLOS engine) it finds a call pattern that returns the output
+distribution, then times each working (backend, pattern) pair on random
+circuits of increasing (modes, photons) size. Every candidate gets one
+untimed warm-up call, the best of REPEATS calls is kept, and the
+probabilities are checked against permanent.probability on a random
+sample of outputs (plus normalisation), so the in-repo engine is not
+validated against itself. The ranking is written as JSON keyed by the Perceval
+version, to perceval_backends.json in the cache directory shared with
+the cuquantum tools ($MATHSHPC_CACHE_DIR or ~/.cache/mathshpc-labs), so
+later runs, and later processes, go straight to the fastest valid
+backend for the requested size. A new Perceval version triggers a new
+calibration.
+
+  selector = default_selector()
+  name, pattern = selector.select(m=8, n=4)
+  dist = selector.probs(circuit, state)        # BSDistribution
+
+Usage:
+  python3 backend_selector.py                     # show (or build) the ranking
+  python3 backend_selector.py --recalibrate
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+# on-disk cache location shared with ../cuquantum (capabilities, autotune)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "cuquantum"))
+from capabilities import cache_dir
+
+CACHE_FILE = "perceval_backends.json"
+
+BENCH_SIZES = ((2, 1), (4, 2), (6, 3), (8, 4), (10, 5), (12, 6))
+TIME_BUDGET = 2.0  # seconds; a backend slower than this at one size is not timed on larger ones
+TOLERANCE = 1e-8  # max |p - p_ref| for a backend to count as valid at a size
+REPEATS = 5  # timed calls per (backend, size) after one warm-up call; the minimum is kept
+REF_SAMPLE = 32  # outputs per size checked against one permanent each
+INREPO_SLOS = "inrepo:SLOS"
+
+
+# --- call patterns: name -> fn(pv, backend name, circuit, state) -> distribution ----
+
+def _simulator_probs(pv, name, circuit, state):
+    sim = pv.Simulator(pv.BackendFactory().get_backend(name))
+    sim.set_circuit(circuit)
+    return sim.probs(state)
+
+
+def _simulator_probs_legacy(pv, name, circuit, state):
+    return pv.Simulator(pv.BackendFactory().get_backend(name)).probs(circuit, state)
+
+
+def _backend_prob_distribution(pv, name, circuit, state):
+    backend = pv.BackendFactory().get_backend(name)
+    backend.set_circuit(circuit)
+    backend.set_input_state(state)
+    return backend.prob_distribution()
+
+
+def _inrepo_slos(pv, name, circuit, state):
+    from slos import SLOS
+    return SLOS(circuit).probs(state)
+
+
+CALL_PATTERNS = {
+    "simulator.probs": _simulator_probs,
+    "simulator.probs(circuit)": _simulator_probs_legacy,
+    "backend.prob_distribution": _backend_prob_distribution,
+}
+
+
+def default_cache_path():
+    return os.path.join(cache_dir(), CACHE_FILE)
+
+
+def _backend_names(pv):
+    try:
+        names = list(pv.BackendFactory.list())
+    except Exception:
+        names = list(getattr(pv, "BACKEND_LIST", {}) or {})
+    return names
+
+
+def _distribution(result):
+    """{occupation tuple: probability} of a distribution returned by a call pattern."""
+    from perceval_show_probs import extract_from_result
+    kind, states, probs = extract_from_result(result)
+    if probs is None:
+        raise ValueError(f"no probabilities in result ({kind})")
+    return dict(zip(map(tuple, states.tolist()), probs.tolist()))
+
+
+def _max_error(dist, ref):
+    """Largest |p - p_ref| over the reference outputs, or the normalisation error if larger."""
+    err = max(abs(dist.get(s, 0.0) - p) for s, p in ref.items())
+    return max(err, abs(sum(dist.values()) - 1.0))
+
+
+def _test_case(pv, m, n, seed=0, sample=REF_SAMPLE):
+    """(circuit, state, {output occupation tuple: probability}) on a sample of outputs.
+
+    The reference probabilities are single permanents (permanent.py),
+    independent of the SLOS recursion that one of the candidates uses.
+    """
+    import numpy as np
+    from fock_encoding import fock_space
+    from permanent import probability, random_unitary
+    u = random_unitary(m, seed=seed)
+    occ = [1] * n + [0] * (m - n)
+    space = fock_space(m, n)
+    rng = np.random.default_rng(seed)
+    outputs = space.decode(rng.choice(space.size, min(sample, space.size), replace=False))
+    ref = {tuple(t): probability(u, occ, t, engine="numpy", n_jobs=1) for t in outputs.tolist()}
+    return pv.Unitary(pv.Matrix(u)), pv.BasicState(occ), ref
+
+
+def discover(pv):
+    """{backend name: call pattern name} for every backend that yields a correct distribution."""
+    circuit, state, ref = _test_case(pv, 2, 1)
+    found = {INREPO_SLOS: INREPO_SLOS}
+    for name in _backend_names(pv):
+        for pattern, fn in CALL_PATTERNS.items():
+            try:
+                if _max_error(_distribution(fn(pv, name, circuit, state)), ref) <= TOLERANCE:
+                    found[name] = pattern
+                    break
+            except Exception:
+                continue  # discovery is the one place where failures are expected
+    return found
+
+
+def _call(pv, name, pattern, circuit, state):
+    fn = _inrepo_slos if pattern == INREPO_SLOS else CALL_PATTERNS[pattern]
+    return fn(pv, name, circuit, state)
+
+
+def _time(pv, name, pattern, circuit, state, repeats, time_budget):
+    """(best seconds, distribution): one warm-up call, then up to `repeats` timed calls."""
+    t0 = time.perf_counter()
+    dist = _distribution(_call(pv, name, pattern, circuit, state))
+    best = time.perf_counter() - t0  # warm-up; only kept if too slow to repeat
+    if best <= time_budget:
+        best = float("inf")
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            _distribution(_call(pv, name, pattern, circuit, state))
+            best = min(best, time.perf_counter() - t0)
+    return best, dist
+
+
+def calibrate(pv, sizes=BENCH_SIZES, time_budget=TIME_BUDGET, repeats=REPEATS, log=None):
+    """Discover backends and time them: {"patterns": {...}, "timings": {"m,n": {name: seconds or None}}}."""
+    patterns = discover(pv)
+    timings = {}
+    too_slow = set()
+    for m, n in sizes:
+        circuit, state, ref = _test_case(pv, m, n, seed=m)
+        row = {}
+        for name, pattern in patterns.items():
+            if name in too_slow:
+                row[name] = None
+                continue
+            try:
+                elapsed, dist = _time(pv, name, pattern, circuit, state, repeats, time_budget)
+                row[name] = elapsed if _max_error(dist, ref) <= TOLERANCE else None
+            except Exception:
+                row[name] = None
+                elapsed = 0.0
+            if elapsed > time_budget:
+                too_slow.add(name)
+        timings[f"{m},{n}"] = row
+        if log:
+            log(f"  m={m:2d} n={n:2d}: " + ", ".join(
+                f"{k} {v * 1e3:.2f} ms" if v is not None else f"{k} -" for k, v in row.items()))
+    return {"patterns": patterns, "timings": timings}
+
+
+class BackendSelector:
+    """Fastest valid Perceval backend per (modes, photons), from a ranking cached on disk."""
+
+    def __init__(self, path=None, sizes=BENCH_SIZES):
+        self.path = path or default_cache_path()
+        self.sizes = sizes
+        self._ranking = None
+        self._pv = None
+
+    @property
+    def pv(self):
+        if self._pv is None:
+            import perceval
+            self._pv = perceval
+        return self._pv
+
+    @property
+    def version(self):
+        return str(getattr(self.pv, "__version__", "unknown"))
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _store(self, data):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(data, f, indent=1, sort_keys=True)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            # persistence is best effort, the ranking still applies to this process
+            print(f"warning: could not write backend ranking {self.path}: {e}", file=sys.stderr)
+
+    def ranking(self, recalibrate=False, log=None):
+        if self._ranking is None or recalibrate:
+            data = self._load()
+            entry = data.get(self.version)
+            if entry is None or recalibrate:
+                entry = calibrate(self.pv, self.sizes, log=log)
+                data[self.version] = entry
+                self._store(data)
+            self._ranking = entry
+        return self._ranking
+
+    def candidates(self, m, n):
+        """[(seconds, backend name, pattern)] for the benchmarked size closest above (m, n), fastest first."""
+        ranking = self.ranking()
+        sizes = sorted(tuple(map(int, k.split(","))) for k in ranking["timings"])
+        covering = [s for s in sizes if s[0] >= m and s[1] >= n]
+        size = covering[0] if covering else sizes[-1]
+        row = ranking["timings"][f"{size[0]},{size[1]}"]
+        return sorted((t, name, ranking["patterns"][name]) for name, t in row.items() if t is not None)
+
+    def select(self, m, n):
+        """(backend name, call pattern) of the fastest valid backend for m modes and n photons."""
+        best = self.candidates(m, n)
+        if not best:
+            raise RuntimeError(f"no valid Perceval backend recorded for perceval {self.version}")
+        return best[0][1], best[0][2]
+
+    def probs(self, circuit, state):
+        """Output distribution of circuit for state with the selected backend."""
+        name, pattern = self.select(circuit.m, state.n)
+        return _call(self.pv, name, pattern, circuit, state)
+
+
+_default = None
+
+
+def default_selector():
+    global _default
+    if _default is None:
+        _default = BackendSelector()
+    return _default
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Perceval backend ranking")
+    p.add_argument("--recalibrate", action="store_true")
+    p.add_argument("--path", default=None, help="ranking file (default perceval_backends.json in $MATHSHPC_CACHE_DIR or ~/.cache/mathshpc-labs)")
+    args = p.parse_args(argv)
+
+    selector = BackendSelector(args.path)
+    print(f"perceval {selector.version}, ranking file {selector.path}")
+    t0 = time.perf_counter()
+    ranking = selector.ranking(recalibrate=args.recalibrate, log=print)
+    print(f"ranking ready in {time.perf_counter() - t0:.2f} s")
+    print("call patterns:", ", ".join(f"{k}: {v}" for k, v in ranking["patterns"].items()))
+    for m, n in selector.sizes:
+        best = selector.candidates(m, n)
+        print(f"  m={m:2d} n={n:2d}: " + "  ".join(f"{name} {t * 1e3:.2f} ms" for t, name, _ in best[:4]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Dense integer ranks for Fock states.
+
+The Fock states of n photons in m modes (BasicState([0, 2, 0, 1]), or
+'|0,2,0,1>') are the compositions of n into m parts; there are
+C(m+n-1, n) of them. FockSpace(m, n) maps each one to its rank in
+lexicographic order of the occupation list, and back, with the
+combinatorial number system: the number of states sharing a prefix and
+having a smaller value in mode i is a difference of two binomials, so
+
+  rank(t) = sum_i C(r_i + k_i, k_i) - C(r_i - t_i + k_i, k_i)
+
+with r_i the photons left before mode i and k_i = m - 1 - i the modes
+after it. encode() evaluates this for a whole (S, m) array with one table
+lookup per mode; decode() inverts it with one searchsorted per mode.
+
+A distribution then becomes a flat float array of length C(m+n-1, n)
+indexed by rank (8 bytes per state instead of a dict entry holding a
+BasicState), and mixing or comparing distributions is plain array
+arithmetic. slos.fock_layer enumerates its states in rank order and takes
+the parent links from lower_table(), so an SLOS output array is already
+indexed by rank.
+
+Usage:
+  python3 fock_encoding.py                        # encode/decode throughput, dict vs flat array memory
+  python3 fock_encoding.py --modes 20 --photons 7
+"""
+import argparse
+import math
+import sys
+import time
+from functools import lru_cache
+
+import numpy as np
+
+
+class FockSpace:
+    """Rank <-> occupation mapping for n photons in m modes."""
+
+    def __init__(self, m, n):
+        if m < 1 or n < 0:
+            raise ValueError(f"need m >= 1 modes and n >= 0 photons, got m={m}, n={n}")
+        self.m, self.n = m, n
+        self.size = math.comb(m + n - 1, n)
+        if self.size >= 2 ** 63:
+            raise OverflowError(f"C({m + n - 1}, {n}) states do not fit int64 ranks")
+        # binom[a, k] = C(a, k) for a <= n + m - 1, k <= m - 1; the largest entry is self.size
+        self._int = np.int32 if self.size < 2 ** 31 else np.int64
+        self._binom = np.array([[math.comb(a, k) for k in range(m)] for a in range(n + m)], dtype=self._int)
+        self._flat = self._binom.ravel()  # C(a, k) = _flat[a * m + k]
+        self._k = np.arange(m - 1, -1, -1, dtype=self._int)  # modes after mode i
+
+    def __len__(self):
+        return self.size
+
+    def __repr__(self):
+        return f"FockSpace(m={self.m}, n={self.n}, size={self.size})"
+
+    def encode(self, states, check=True):
+        """Ranks (int64) of an (S, m) occupation array, or of one occupation list (empty input: no ranks)."""
+        t = np.asarray(states, dtype=np.int64)
+        single = t.ndim == 1 and t.size == self.m
+        t = t.reshape(-1, self.m)
+        if check and len(t) and (np.any(t < 0) or np.any(t.sum(axis=1) != self.n)):
+            raise ValueError(f"states must have {self.m} non-negative occupations summing to {self.n}")
+        flat, m, k = self._flat, self.m, self._k
+        r = self.n - np.cumsum(t, axis=1) + t  # photons left before mode i, mode i included
+        full = (r + k) * m + k  # flat index of C(r + k, k)
+        ranks = (flat[full] - flat[full - t * m]).sum(axis=1, dtype=np.int64)
+        return int(ranks[0]) if single else ranks
+
+    def decode(self, ranks, dtype=np.uint8):
+        """(S, m) occupation array of int ranks (one occupation list for a scalar rank)."""
+        single = np.ndim(ranks) == 0
+        residual = np.array(ranks, dtype=np.int64).reshape(-1)
+        if len(residual) and (residual.min() < 0 or residual.max() >= self.size):
+            raise ValueError(f"ranks must lie in [0, {self.size})")
+        out = np.empty((len(residual), self.m), dtype=dtype)
+        r = np.full(len(residual), self.n, dtype=np.int64)
+        for i in range(self.m - 1):
+            k = self.m - 1 - i
+            # largest v with C(r+k,k) - C(r-v+k,k) <= residual, i.e. smallest a = r-v+k with C(a,k) >= threshold
+            threshold = self._binom[r + k, k] - residual
+            a = np.searchsorted(self._binom[:, k], threshold, side="left")
+            a = np.maximum(a, k)
+            v = r + k - a
+            out[:, i] = v
+            residual -= self._binom[r + k, k] - self._binom[a, k]
+            r -= v
+        out[:, self.m - 1] = r
+        return out[0].tolist() if single else out
+
+    def lower_ranks(self, states):
+        """(S, m) ranks of states - e_j in FockSpace(m, n - 1); -1 where mode j is empty.
+
+        Removing a photon from mode j only changes the rank terms of modes
+        i <= j (one photon fewer is left before each of them), so all m
+        neighbours come from cumulative sums of the per-mode terms.
+        """
+        t = np.asarray(states).reshape(-1, self.m).astype(self._int)
+        flat, m, k = self._flat, self.m, self._k
+        r = self.n - np.cumsum(t, axis=1, dtype=self._int) + t  # photons left before mode i, mode i included
+        full = (r + k) * m + k  # flat index of C(r + k, k)
+        rest = full - t * m  # C(r - t + k, k)
+        term = flat[full] - flat[rest]
+        minus = np.maximum(full - m, k)  # C(r - 1 + k, k); clipped entries are masked below
+        fewer = flat[minus] - flat[np.maximum(rest - m, k)]  # modes i < j
+        own = flat[minus] - flat[rest]  # mode i == j
+        delta = fewer - term
+        out = term.sum(axis=1, dtype=np.int64)[:, None] + (np.cumsum(delta, axis=1, dtype=self._int) - delta + own - term)
+        out[t == 0] = -1
+        return out
+
+    def states(self, dtype=np.uint8):
+        """All states in rank order, (size, m).
+
+        Built by blocks rather than decoded: the states with t_0 = v are
+        [v, states of n - v photons in m - 1 modes], and v = 0, 1, ..., n in
+        turn is lexicographic order.
+        """
+        memo = {}
+
+        def block(m, n):
+            if (m, n) not in memo:
+                if m == 1:
+                    memo[m, n] = np.full((1, 1), n, dtype=dtype)
+                else:
+                    parts = [block(m - 1, n - v) for v in range(n + 1)]
+                    out = np.empty((sum(len(b) for b in parts), m), dtype=dtype)
+                    lo = 0
+                    for v, b in enumerate(parts):
+                        out[lo:lo + len(b), 0] = v
+                        out[lo:lo + len(b), 1:] = b
+                        lo += len(b)
+                    memo[m, n] = out
+            return memo[m, n]
+
+        return block(self.m, self.n)
+
+    def lower_table(self):
+        """lower_ranks(states()) built by blocks, (size, m) int32 or int64.
+
+        In the block t_0 = v, removing the photon of mode 0 lands on the
+        same tail at offset v - 1 of FockSpace(m, n - 1), and removing one
+        from a later mode lands in its block v, shifted from the tail's own
+        table.
+        """
+        if self.n == 0:
+            return np.full((1, self.m), -1, dtype=self._int)
+        memo = {}
+
+        def block(m, n):
+            # lower ranks of the (m, n) states inside their own (m, n - 1) space
+            if (m, n) not in memo:
+                if m == 1:
+                    memo[m, n] = np.zeros((1, 1), dtype=self._int)
+                    return memo[m, n]
+                sizes = [math.comb(m - 2 + n - v, n - v) for v in range(n + 1)]  # block t_0 = v in (m, n)
+                starts = np.cumsum([0] + sizes[1:])  # first rank of block t_0 = v in (m, n - 1)
+                out = np.empty((sum(sizes), m), dtype=self._int)
+                lo = 0
+                for v, size in enumerate(sizes):
+                    rows = slice(lo, lo + size)
+                    out[rows, 0] = np.arange(starts[v - 1], starts[v - 1] + size) if v else -1
+                    if v < n:
+                        tail = block(m - 1, n - v)
+                        out[rows, 1:] = np.where(tail < 0, -1, tail + starts[v])
+                    else:
+                        out[rows, 1:] = -1
+                    lo += size
+                memo[m, n] = out
+            return memo[m, n]
+
+        return block(self.m, self.n)
+
+    def to_dense(self, states, probs):
+        """Flat (size,) array with probs accumulated at the ranks of states."""
+        return np.bincount(self.encode(states), weights=np.asarray(probs, dtype=float), minlength=self.size)
+
+    def from_dense(self, dense, threshold=0.0):
+        """(states, values) of the entries of a flat array above threshold."""
+        idx = np.nonzero(dense > threshold)[0]
+        return self.decode(idx), dense[idx]
+
+
+@lru_cache(maxsize=64)
+def fock_space(m, n):
+    return FockSpace(m, n)
+
+
+def rank(state):
+    """Rank of one Fock state (BasicState, occupation list or '|0,2,0,1>' string) in its (m, n) space."""
+    if isinstance(state, str):
+        state = state.strip().lstrip("|").rstrip(">").split(",")
+    occ = [int(x) for x in state]
+    return fock_space(len(occ), sum(occ)).encode(occ)
+
+
+def unrank(r, m, n):
+    """Occupation list of rank r among n photons in m modes."""
+    return fock_space(m, n).decode(r)
+
+
+def dense_from_result(res, m=None):
+    """(FockSpace, flat probability array) for a sim.probs() result (see perceval_show_probs).
+
+    All states must carry the same number of photons.
+    """
+    from perceval_show_probs import extract_from_result
+    kind, states, probs = extract_from_result(res)
+    if probs is None:
+        raise ValueError(f"no probabilities in result ({kind})")
+    if len(states) == 0:
+        raise ValueError("empty distribution")
+    photons = np.unique(states.sum(axis=1, dtype=np.int64))
+    if len(photons) != 1:
+        raise ValueError(f"states with different photon numbers {photons.tolist()}")
+    space = fock_space(m or states.shape[1], int(photons[0]))
+    return space, space.to_dense(states, probs)
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Fock state rank encoding: throughput and memory")
+    p.add_argument("--modes", type=int, default=18)
+    p.add_argument("--photons", type=int, default=8)
+    p.add_argument("--dict-max", type=int, default=2_000_000,
+                   help="largest space also stored as a dict of BasicState for comparison")
+    args = p.parse_args(argv)
+
+    space = FockSpace(args.modes, args.photons)
+    print(space)
+    t0 = time.perf_counter()
+    states = space.states()
+    t_enum = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    decoded = space.decode(np.arange(space.size))
+    t_dec = time.perf_counter() - t0
+    assert np.array_equal(decoded, states)
+    t0 = time.perf_counter()
+    ranks = space.encode(states)
+    t_enc = time.perf_counter() - t0
+    assert np.array_equal(ranks, np.arange(space.size))
+    assert np.all(np.diff(states.astype(np.int64) @ (args.photons + 1) ** np.arange(args.modes - 1, -1, -1)) > 0)
+    print(f"decode {space.size / t_dec / 1e6:.1f} M states/s, encode {space.size / t_enc / 1e6:.1f} M states/s "
+          f"(round trip exact, lexicographic order); states() {t_enum * 1e3:.0f} ms")
+
+    rng = np.random.default_rng(0)
+    a, b = rng.random(space.size), rng.random(space.size)
+    a /= a.sum()
+    b /= b.sum()
+    t0 = time.perf_counter()
+    mixed = 0.3 * a + 0.7 * b
+    t_mix = time.perf_counter() - t0
+    print(f"flat distribution: {a.nbytes / 2**20:.1f} MiB, mixing two {t_mix * 1e3:.1f} ms, "
+          f"total {mixed.sum():.6f}")
+
+    if space.size <= args.dict_max:
+        try:
+            import perceval as pcvl
+        except ImportError:
+            return
+        t0 = time.perf_counter()
+        keys = [pcvl.BasicState(s) for s in states.tolist()]
+        da = dict(zip(keys, a.tolist()))
+        db = dict(zip(keys, b.tolist()))
+        t_build = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        dm = {k: 0.3 * da[k] + 0.7 * db.get(k, 0.0) for k in da}
+        t_dmix = time.perf_counter() - t0
+        size = sys.getsizeof(da) + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in da.items())
+        print(f"dict of BasicState: >= {size / 2**20:.1f} MiB, built in {t_build:.2f} s, "
+              f"mixing two {t_dmix * 1e3:.1f} ms ({t_dmix / t_mix:.0f}x), "
+              f"max|diff| {max(abs(dm[k] - mixed[i]) for i, k in enumerate(keys[:1000])):.1e}")
+
+
+if __name__ == "__main__":
+    main()
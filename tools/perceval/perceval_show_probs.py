@@ -1,87 +1,174 @@
 #!/usr/bin/env python3
 """
-Inspecte un résultat de sim.probs() et tente d'en extraire des probabilités
-ou des amplitudes de façon robuste, en testant plusieurs attributs/méthodes.
+Inspecte un résultat de sim.probs() et en extrait les probabilités sous
+forme colonnaire : un tableau NumPy d'états (S, m) en entiers (occupation
+de chaque mode) et, à côté, le tableau (S,) des probabilités.
+
+Le chemin d'extraction qui fonctionne (mapping keys()/values(), méthode
+as_dict()/to_dict()/..., attribut, états itérés + poids parallèles, paires
+(état, amplitude) d'un StateVector -> |a|^2) est cherché une seule fois
+par type de résultat, états encodés compris, puis mis en cache : les appels
+suivants sur le même type ne sondent plus aucun attribut, ne passent par
+aucune exception et ne formatent aucun état en chaîne.
+
+Usage:
+    python3 perceval_show_probs.py
+    python3 perceval_show_probs.py --repeat 100000   # coût d'une extraction une fois le chemin appris
 """
-import pprint, traceback
+import argparse
+import pprint
+import time
+import traceback
+
+import numpy as np
+
+CANDIDATES = (
+    "as_dict", "to_dict", "get_probs", "get_probabilities", "probabilities",
+    "probs", "weights", "get_weights", "items", "distribution",
+)
+WEIGHT_ATTRS = ("weights", "probs", "probabilities")
+
+_ADAPTERS = {}  # type du résultat -> (nom du chemin, adapter) ; seuls les chemins qui ont réussi
+adapter_stats = {"probes": 0, "hits": 0}
+
 
 def safe_print(*a, **kw):
     print(*a, **kw, flush=True)
 
+
+def _columns(out):
+    """(états, probabilités) d'un mapping ou d'un itérable de paires (état, probabilité)."""
+    if hasattr(out, "keys") and hasattr(out, "values"):
+        states = list(out.keys())
+        return states, np.fromiter(out.values(), dtype=float, count=len(states))
+    pairs = list(out.items() if hasattr(out, "items") else out)
+    if not pairs:
+        return [], np.zeros(0)
+    states, probs = zip(*pairs)
+    return list(states), np.asarray(probs, dtype=float)
+
+
+def _method_adapter(name):
+    return lambda res: _columns(getattr(res, name)())
+
+
+def _attribute_adapter(name):
+    return lambda res: _columns(getattr(res, name))
+
+
+def _parallel_adapter(name):
+    def adapter(res):
+        states = list(res)
+        probs = np.asarray(list(getattr(res, name)), dtype=float)
+        if len(probs) != len(states):
+            raise ValueError(f"{len(states)} states but {len(probs)} {name}")
+        return states, probs
+    return adapter
+
+
+def _pairs_abs2(res):
+    """Itérable de paires (état, amplitude), p. ex. un StateVector : probabilités |a|^2."""
+    pairs = list(res)
+    if not pairs or not all(isinstance(p, tuple) and len(p) == 2 for p in pairs):
+        raise ValueError("not an iterable of (state, amplitude) pairs")
+    states, amps = zip(*pairs)
+    return list(states), np.abs(np.asarray(amps, dtype=complex)) ** 2
+
+
+def _states_only(res):
+    return list(res), None
+
+
+def _paths(res):
+    """Chemins candidats pour ce résultat, dans l'ordre où ils sont essayés."""
+    if hasattr(res, "items"):
+        yield "items", _columns
+    for name in CANDIDATES:
+        attr = getattr(res, name, None)
+        if callable(attr):
+            yield name + "()", _method_adapter(name)
+        elif attr is not None:
+            yield name, _attribute_adapter(name)
+    if hasattr(res, "__iter__"):
+        for name in WEIGHT_ATTRS:
+            if hasattr(res, name):
+                yield "iter_plus_" + name, _parallel_adapter(name)
+        yield "iter_pairs_abs2", _pairs_abs2
+        yield "iter_states", _states_only
+
+
+def _apply(adapter, res):
+    """(états encodés (S, m), probabilités ou None) ; lève si le chemin ou l'encodage échoue."""
+    states, probs = adapter(res)
+    return encode_states(states), probs
+
+
+def _learn(res):
+    """Sonde res ; mémorise et applique le premier chemin qui fonctionne.
+
+    Un chemin ne compte comme réussi que si ses états s'encodent aussi ;
+    sinon on passe au suivant. Un échec n'est pas mémorisé : un autre
+    résultat du même type peut réussir, il sera sondé à son tour.
+    """
+    adapter_stats["probes"] += 1
+    for kind, adapter in _paths(res):
+        try:
+            out = _apply(adapter, res)
+        except Exception:
+            continue
+        _ADAPTERS[type(res)] = (kind, adapter)
+        return kind, out
+    return "unknown", None
+
+
+def register_adapter(result_type, adapter, kind=None):
+    """Chemin explicite pour un type : adapter(res) -> (états, probabilités ou None)."""
+    _ADAPTERS[result_type] = (kind or getattr(adapter, "__name__", "custom"), adapter)
+
+
+def encode_states(states):
+    """Liste d'états (BasicState, séquences d'entiers ou chaînes '|0,2,0,1>') -> tableau (S, m) entier."""
+    if len(states) == 0:
+        return np.zeros((0, 0), dtype=np.uint8)
+    if isinstance(states[0], str):
+        states = [s.strip().lstrip("|").rstrip(">").split(",") for s in states]
+    arr = np.array(states, dtype=np.int64)
+    return arr.astype(np.uint8) if arr.size == 0 or arr.max() < 256 else arr
+
+
 def extract_from_result(res):
-    # 1) si c'est un mapping .items()
-    try:
-        if hasattr(res, "items"):
-            try:
-                d = dict(res.items())
-                return "items", d
-            except Exception:
-                pass
-    except Exception:
-        pass
-
-    # 2) méthodes usuelles possibles
-    candidates = [
-        "as_dict", "to_dict", "get_probs", "get_probabilities", "probabilities",
-        "probs", "weights", "get_weights", "items", "distribution"
-    ]
-    for name in candidates:
+    """(chemin, états (S, m) entiers, probabilités (S,) ou None) pour un résultat de sim.probs().
+
+    chemin vaut "unknown" (états et probabilités None) si aucune extraction
+    ne fonctionne pour ce type.
+    """
+    cached = _ADAPTERS.get(type(res))
+    if cached is None:
+        kind, out = _learn(res)
+    else:
+        kind, adapter = cached
         try:
-            attr = getattr(res, name, None)
-            if callable(attr):
-                try:
-                    out = attr()
-                    if isinstance(out, dict):
-                        return name + "()", out
-                    # if out is iterable of pairs
-                    try:
-                        d = dict(out)
-                        return name + "()", d
-                    except Exception:
-                        # continue
-                        pass
-                except Exception:
-                    pass
-            elif attr is not None:
-                # attribute present
-                if isinstance(attr, dict):
-                    return name, attr
-                # list/iterable of pairs?
-                try:
-                    d = dict(attr)
-                    return name, d
-                except Exception:
-                    # maybe it's an array of weights aligning with states yielded by iterating res
-                    pass
+            out = _apply(adapter, res)
+            adapter_stats["hits"] += 1
         except Exception:
-            pass
+            del _ADAPTERS[type(res)]  # même type mais autre contenu : on réapprend
+            kind, out = _learn(res)
+    if out is None:
+        return kind, None, None
+    states, probs = out
+    return kind, states, probs
+
+
+def format_state(occupations):
+    return "|" + ",".join(str(int(x)) for x in occupations) + ">"
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Extraction colonnaire d'un résultat sim.probs()")
+    p.add_argument("--repeat", type=int, default=0,
+                   help="extractions répétées pour mesurer le coût une fois le chemin en cache")
+    args = p.parse_args(argv)
 
-    # 3) try to see if object has a .__iter__ and we can inspect elements + check for attached weights
-    try:
-        if hasattr(res, "__iter__"):
-            lst = list(res)
-            # try to find weights/attributes on the result object itself
-            for maybe_w in ("weights", "probs", "probabilities"):
-                if hasattr(res, maybe_w):
-                    w = getattr(res, maybe_w)
-                    try:
-                        # assume parallel lists
-                        d = {}
-                        for s, p in zip(lst, list(w)):
-                            d[str(s)] = float(p)
-                        return "iter_plus_" + maybe_w, d
-                    except Exception:
-                        pass
-            # fallback: return the list of states (no probs)
-            return "iter_states", {str(s): None for s in lst}
-    except Exception:
-        pass
-
-    # 4) give up: return repr and dir for manual inspection
-    info = {"repr": repr(res)[:1000], "dir": [n for n in dir(res) if not n.startswith("_")]}
-    return "unknown", info
-
-def main():
     try:
         import perceval as pv
     except Exception as e:
@@ -108,30 +195,34 @@ def main():
 
     safe_print("Type du résultat:", type(res))
     safe_print("repr(result) (troncature):", repr(res)[:400])
-    safe_print("dir(result) sample (first 200):", [n for n in dir(res) if not n.startswith("_")][:200])
 
-    kind, info = extract_from_result(res)
+    t0 = time.perf_counter()
+    kind, states, probs = extract_from_result(res)
+    t_first = time.perf_counter() - t0
     safe_print("\nExtraction method:", kind)
-    safe_print("Extracted info:")
-    pprint.pprint(info)
-
-    # If we got probabilities (numerical), print them in sorted order
-    if isinstance(info, dict):
-        if all(v is None for v in info.values()):
-            safe_print("\nOnly states listed, no numeric probabilities available.")
-        else:
-            # convert keys to string and sort by prob desc (None treated as 0)
-            items = [(k, (v if v is not None else 0.0)) for k, v in info.items()]
-            items.sort(key=lambda x: -x[1])
-            safe_print("\nState -> probability (sorted):")
-            for s, p in items:
-                safe_print(f"{s} -> {p:.6f}")
-    else:
+
+    if kind == "unknown":
         safe_print("\nCould not extract numeric probabilities. Dumping info for manual inspection:")
-        pprint.pprint(info)
+        pprint.pprint({"repr": repr(res)[:1000], "dir": [n for n in dir(res) if not n.startswith("_")]})
+    elif probs is None:
+        safe_print("\nOnly states listed, no numeric probabilities available.")
+        for s in states:
+            safe_print(format_state(s))
+    else:
+        safe_print("States (S, m):", states.dtype, states.shape, " probabilities:", probs.dtype, probs.shape)
+        safe_print("\nState -> probability (sorted):")
+        for i in np.argsort(-probs, kind="stable"):
+            safe_print(f"{format_state(states[i])} -> {probs[i]:.6f}")
 
-    safe_print("\nSi vous voulez, je peux adapter l'extraction à la structure exacte affichée ci-dessus.")
+    if args.repeat:
+        t0 = time.perf_counter()
+        for _ in range(args.repeat):
+            extract_from_result(res)
+        t_cached = (time.perf_counter() - t0) / args.repeat
+        safe_print(f"\nfirst extraction (probe) {t_first * 1e6:.1f} us, cached {t_cached * 1e6:.2f} us/result "
+                   f"over {args.repeat} results; {adapter_stats['probes']} probe(s), "
+                   f"{adapter_stats['hits']} cache hits")
     return 0
 
 if __name__ == "__main__":
-    exit(main())
\ No newline at end of file
+    exit(main())
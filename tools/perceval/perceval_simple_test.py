@@ -2,8 +2,8 @@
 """
 Petit test Perceval : on construit un circuit 2 modes, on tente d'ajouter un BS
 (s'il accepte l'appel), on crée un état d'entrée simple et on simule avec le
-simulateur disponible en appelant la méthode 'probs' / 'probability' / 'prob_amplitude'
-suivant ce qui est supporté.
+backend le plus rapide pour cette taille, choisi par backend_selector (classement
+mesuré une fois et conservé sur disque).
 
 Exécution :
     python3 perceval_simple_test.py
@@ -88,109 +88,23 @@ def main():
     else:
         safe_print("BasicState non disponible dans perceval; on continuera sans état explicite.")
 
-    # 4) Obtenir un backend via BackendFactory si possible
-    backend_instance = None
-    try:
-        BackendFactory = getattr(pv, "BackendFactory", None)
-        if BackendFactory is not None:
-            bf = BackendFactory()
-            safe_print("BackendFactory instanciée:", bf)
-            # prefer built-in naive backends if present
-            preferred = ["NaiveBackend", "NaiveApproxBackend", "MPSBackend", "SLAPBackend", "SLOSBackend", "IFFBackend", "Clifford2017Backend"]
-            for name in preferred:
-                try:
-                    inst = bf.get_backend(name)
-                    if inst is not None:
-                        backend_instance = inst
-                        safe_print(f"Backend obtenu: {name} ->", type(inst))
-                        break
-                except Exception as e:
-                    # ignore and try next
-                    pass
-            # fallback: try factory.list or BACKEND_LIST
-            if backend_instance is None:
-                try:
-                    lst = bf.list()
-                    safe_print("BackendFactory.list() ->", lst)
-                    if lst:
-                        try:
-                            backend_instance = bf.get_backend(lst[0])
-                            safe_print("Backend obtenu via liste:", type(backend_instance))
-                        except Exception:
-                            backend_instance = None
-                except Exception:
-                    pass
-    except Exception as e:
-        safe_print("Erreur en manipulant BackendFactory:", e)
-
-    # If still none, try to instantiate a backend class by name if exported at top-level
-    if backend_instance is None:
-        for cand in ("NaiveBackend", "NaiveApproxBackend", "MPSBackend", "Clifford2017Backend"):
-            cls = getattr(pv, cand, None)
-            if cls and callable(cls):
-                try:
-                    backend_instance = cls()
-                    safe_print(f"Instancié backend direct {cand} ->", type(backend_instance))
-                    break
-                except Exception as e:
-                    safe_print(f"Instanciation {cand}() failed:", e)
-
-    if backend_instance is None:
-        safe_print("Aucun backend disponible — arrêt.")
+    # 4) Backend et méthode d'appel : classement établi une seule fois par
+    # backend_selector (découverte + chronométrage, en cache disque par version de Perceval)
+    if basic_state is None:
+        safe_print("Pas d'état d'entrée -> arrêt.")
         return 4
-
-    # 5) Construire un Simulator et appeler une méthode de probabilité
-    Simulator = getattr(pv, "Simulator", None)
-    if Simulator is None:
-        safe_print("Simulator non disponible dans perceval -> arrêt.")
-        return 5
-
     try:
-        sim = Simulator(backend_instance)
-        safe_print("Simulator instancié:", sim)
+        from backend_selector import default_selector
+        selector = default_selector()
+        name, pattern = selector.select(circuit.m, basic_state.n)
+        safe_print(f"Backend retenu pour m={circuit.m}, n={basic_state.n} : {name} via {pattern}")
+        result = selector.probs(circuit, basic_state)
     except Exception as e:
-        safe_print("Erreur instanciation Simulator:", e)
-        return 6
-
-    # Essayer des méthodes de simulation / probabilité connues
-    sim_method_candidates = ["probs", "probability", "prob_amplitude", "probability_amplitude", "probs_svd", "probability_svd"]
-    result = None
-    for m in sim_method_candidates:
-        if hasattr(sim, m):
-            fn = getattr(sim, m)
-            try:
-                safe_print(f"Appel de sim.{m} avec (circuit, basic_state) ...")
-                if basic_state is not None:
-                    result = fn(circuit, basic_state)
-                else:
-                    result = fn(circuit)
-                safe_print(f"sim.{m} a réussi ; type résultat: {type(result)}")
-                break
-            except Exception as e:
-                safe_print(f"sim.{m} a levé {type(e).__name__}: {e}")
-
-    # Si pas de résultat, essayer méthodes alternatives sur le backend
-    if result is None:
-        for m in ("sample", "run", "simulate", "get_samples"):
-            if hasattr(backend_instance, m):
-                try:
-                    fn = getattr(backend_instance, m)
-                    safe_print(f"Appel de backend.{m} ...")
-                    if basic_state is not None:
-                        result = fn(circuit, basic_state)
-                    else:
-                        result = fn(circuit)
-                    safe_print(f"backend.{m} a réussi ; type résultat: {type(result)}")
-                    break
-                except TypeError as te:
-                    safe_print(f"backend.{m} TypeError: {te}")
-                except Exception as e:
-                    safe_print(f"backend.{m} Exception: {type(e).__name__}: {e}")
-
-    if result is None:
-        safe_print("Aucun résultat de simulation obtenu. Voir diagnostics ci-dessus.")
+        safe_print("Erreur lors de la simulation:", type(e).__name__, e)
+        safe_print(traceback.format_exc())
         return 7
 
+
     safe_print("=== Résultat de simulation (tentative d'interprétation) ===")
     # Afficher quelques formats usuels
     try:
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+SLOS-style strong simulation: the full output distribution of a linear
+optical circuit, built photon by photon.
+
+Injecting the photons of the input state one at a time, a k-photon
+partial state is a vector over all C(m+k-1, k) Fock states of k photons
+in m modes, and adding a photon from input mode i gives
+
+  a_{k+1}(t) = sum_j U[j, i] sqrt(t_j) a_k(t - e_j)
+
+so every partial Fock state is computed once and shared by all the
+outputs that extend it, instead of one permanent per output state
+(permanent.py). The (m, k) layer structure does not depend on the circuit
+and is cached. Each layer stores its states as a (S, m) uint8 array in
+rank order (fock_encoding) and, for each state and mode, the rank of its
+parent t - e_j as int32, both built block by block rather than by search.
+A step is then one gather and one row sum. Partial amplitudes are also
+cached per input prefix, so |1,1,0,1> reuses the layers of |1,1,0,0>.
+
+On one core, m = 18 modes and n = 8 photons (1.08 M outputs) take 1.0 s
+and 150 MiB, mostly the parent index table. One permanent per output
+would take about 130 s, and perceval's SLOS backend takes 0.52 s for
+n = 6 against 0.09 s here.
+
+SLOS accepts a perceval Circuit (or any unitary matrix) and BasicState
+inputs of indistinguishable photons; annotated states (|{_:0},{_:1}>,
+polarisation) are rejected with ValueError. probs() returns a perceval
+BSDistribution like Simulator.probs, probs_array() the columnar (states,
+probabilities) pair.
+
+Usage:
+  python3 slos.py                                 # time and memory as m, n grow vs one permanent per output
+  python3 slos.py --modes 8 12 16 --photons 2 4 6
+"""
+import argparse
+import math
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+
+from fock_encoding import fock_space
+
+PREFIX_CACHE_BYTES = 256 << 20  # partial amplitudes kept per input prefix
+PROB_THRESHOLD = 1e-16  # probabilities at or below this are left out of probs()
+
+
+@lru_cache(maxsize=64)
+def fock_layer(m, k):
+    """(states, parents) for k photons in m modes.
+
+    states is (S, m) uint8 in rank order (fock_encoding, lexicographic);
+    parents[s, j] is the index of states[s] - e_j in fock_layer(m, k - 1),
+    or S_{k-1} (one past the end) when mode j is empty. Both arrays are
+    read-only.
+    """
+    space = fock_space(m, k)
+    states = space.states()
+    if k == 0:
+        parents = np.zeros((1, m), dtype=np.int32)
+    else:
+        parents = space.lower_table().astype(np.int32, copy=False)
+        parents[parents < 0] = fock_space(m, k - 1).size
+    states.setflags(write=False)
+    parents.setflags(write=False)
+    return states, parents
+
+
+def _unitary(circuit):
+    if hasattr(circuit, "compute_unitary"):
+        circuit = circuit.compute_unitary()
+    u = np.asarray(circuit, dtype=complex)
+    if u.ndim != 2 or u.shape[0] != u.shape[1]:
+        raise ValueError(f"expected a square unitary, got shape {u.shape}")
+    return u
+
+
+def _occupations(state, m):
+    if getattr(state, "has_annotations", False):
+        # annotated photons may be distinguishable; SLOS treats all photons as identical
+        raise ValueError(f"annotated input state {state} is not supported (indistinguishable photons only)")
+    occ = [int(x) for x in state]
+    if len(occ) != m:
+        raise ValueError(f"input state has {len(occ)} modes, circuit has {m}")
+    return occ
+
+
+class SLOS:
+    """Output distributions of one circuit, with partial states shared across inputs."""
+
+    def __init__(self, circuit, prefix_cache_bytes=PREFIX_CACHE_BYTES):
+        self.u = _unitary(circuit)
+        self.m = self.u.shape[0]
+        self.prefix_cache_bytes = prefix_cache_bytes
+        self._prefixes = OrderedDict()  # tuple of input modes -> amplitudes
+        self._sqrt = np.sqrt(np.arange(256))
+        self.stats = {"steps": 0, "reused_steps": 0}
+
+    def _cached(self, prefix):
+        amps = self._prefixes.get(prefix)
+        if amps is not None:
+            self._prefixes.move_to_end(prefix)
+        return amps
+
+    def _remember(self, prefix, amps):
+        self._prefixes[prefix] = amps
+        while sum(a.nbytes for a in self._prefixes.values()) > self.prefix_cache_bytes and len(self._prefixes) > 1:
+            self._prefixes.popitem(last=False)
+
+    def amplitudes(self, state):
+        """(states (S, m) uint8, amplitudes (S,) complex) of U|state>."""
+        occ = _occupations(state, self.m)
+        photons = tuple(i for i, c in enumerate(occ) for _ in range(c))
+        n = len(photons)
+        k = n
+        while k > 0 and self._cached(photons[:k]) is None:
+            k -= 1
+        amps = self._cached(photons[:k]) if k else np.ones(1, dtype=complex)
+        self.stats["reused_steps"] += k
+        for step in range(k, n):
+            states, parents = fock_layer(self.m, step + 1)
+            padded = np.append(amps, 0)
+            coef = self._sqrt[states] * self.u[:, photons[step]]
+            amps = np.einsum("sj,sj->s", padded[parents], coef)
+            self.stats["steps"] += 1
+            if step + 1 < n:
+                self._remember(photons[:step + 1], amps)
+        amps = amps / math.sqrt(math.prod(math.factorial(c) for c in occ))
+        return fock_layer(self.m, n)[0], amps
+
+    def probs_array(self, state):
+        """Columnar output distribution: (states (S, m) uint8, probabilities (S,))."""
+        states, amps = self.amplitudes(state)
+        return states, amps.real ** 2 + amps.imag ** 2
+
+    def probs(self, state, threshold=PROB_THRESHOLD):
+        """Output distribution as a perceval BSDistribution (same content as Simulator.probs)."""
+        import perceval as pcvl
+        states, probabilities = self.probs_array(state)
+        keep = np.nonzero(probabilities > threshold)[0]
+        dist = pcvl.BSDistribution()
+        for s, p in zip(states[keep].tolist(), probabilities[keep].tolist()):
+            dist[pcvl.BasicState(s)] = p
+        return dist
+
+    def memory(self, n):
+        """Bytes held by the layer structures up to n photons and the cached partial amplitudes."""
+        layers = sum(a.nbytes for k in range(n + 1) for a in fock_layer(self.m, k))
+        return layers + sum(a.nbytes for a in self._prefixes.values())
+
+    def clear(self):
+        self._prefixes.clear()
+
+
+def probs(circuit, state):
+    """One-off output distribution of `circuit` for input `state` (BSDistribution)."""
+    return SLOS(circuit).probs(state)
+
+
+# --- benchmark ---------------------------------------------------------------
+
+def main(argv=None):
+    from permanent import amplitude, random_unitary
+
+    p = argparse.ArgumentParser(description="SLOS strong simulation vs one permanent per output")
+    p.add_argument("--modes", type=int, nargs="+", default=[6, 10, 14, 18])
+    p.add_argument("--photons", type=int, nargs="+", default=[2, 4, 6, 8])
+    p.add_argument("--perm-sample", type=int, default=300,
+                   help="permanents timed per size; the full cost is extrapolated")
+    p.add_argument("--perceval-max", type=int, default=200000,
+                   help="largest output space also run through perceval's SLOS backend")
+    args = p.parse_args(argv)
+
+    try:
+        import perceval as pcvl
+    except ImportError:
+        pcvl = None
+
+    print(f"{'m':>3}  {'n':>2}  {'outputs':>9}  {'SLOS s':>8}  {'SLOS MiB':>8}  {'perm/output s':>13}  "
+          f"{'speedup':>8}  {'perceval s':>10}  max|dp|")
+    for m in args.modes:
+        u = random_unitary(m, seed=m)
+        for n in args.photons:
+            if n > m:
+                continue
+            state = [1] * n + [0] * (m - n)
+            fock_layer.cache_clear()
+            engine = SLOS(u)
+            t0 = time.perf_counter()
+            states, probs_ = engine.probs_array(state)
+            t_slos = time.perf_counter() - t0
+            mem = engine.memory(n) + probs_.nbytes
+
+            rng = np.random.default_rng(0)
+            sample = rng.choice(len(states), min(args.perm_sample, len(states)), replace=False)
+            t0 = time.perf_counter()
+            perm_p = np.array([abs(amplitude(u, state, states[i], engine="numpy", n_jobs=1)) ** 2
+                               for i in sample])
+            t_perm = (time.perf_counter() - t0) * len(states) / len(sample)
+            diff = np.max(np.abs(perm_p - probs_[sample]))
+
+            line = (f"{m:3d}  {n:2d}  {len(states):9d}  {t_slos:8.4f}  {mem / 2**20:8.2f}  "
+                    f"{t_perm:12.3f}{'*' if len(sample) < len(states) else ' '}  {t_perm / t_slos:7.0f}x")
+            if pcvl is not None and len(states) <= args.perceval_max:
+                circuit = pcvl.Unitary(pcvl.Matrix(u))
+                sim = pcvl.Simulator(pcvl.BackendFactory().get_backend("SLOS"))
+                sim.set_circuit(circuit)
+                t0 = time.perf_counter()
+                ref = sim.probs(pcvl.BasicState(state))
+                t_ref = time.perf_counter() - t0
+                index = {tuple(s): i for i, s in enumerate(states.tolist())}
+                ref_p = np.zeros(len(states))
+                for s, pr in ref.items():
+                    ref_p[index[tuple(s)]] = pr
+                diff = max(diff, np.max(np.abs(ref_p - probs_)))
+                line += f"  {t_ref:10.4f}"
+            else:
+                line += f"  {'-':>10}"
+            print(line + f"  {diff:.1e}")
+    print("* extrapolated from --perm-sample permanents")
+
+
+if __name__ == "__main__":
+    main()
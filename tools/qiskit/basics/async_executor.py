@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Asynchronous execution layer for Aer (or any BackendV2) jobs.
+
+backend.run(...).result() blocks the caller on one job at a time. An
+AsyncExecutor accepts many circuits, runs at most max_workers of them
+concurrently in a thread pool (Aer simulates in C++ without holding the
+GIL), and hands results back as they finish:
+
+  async with AsyncExecutor(backend, max_workers=8) as ex:
+      async for r in ex.as_completed(circuits, shots=1024):
+          print(r.index, r.status, r.counts)
+
+Each job can have a timeout, counted from the moment a worker thread
+picks it up (the caller stops waiting; status "timeout"; the worker keeps
+its slot until backend.run returns, so queued jobs are not started on top
+of it), and can be cancelled (queued jobs never start; a job already
+inside backend.run finishes in its worker and its result is dropped).
+Circuits go through the transpile cache, which is thread-safe.
+Throughput statistics (jobs/s, queue wait, execution time) are collected
+per executor.
+
+Usage:
+  python3 async_executor.py                        # 200 random circuits, sequential vs async
+  python3 async_executor.py --jobs 1000 --workers 16 --qubits 12
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from transpile_cache import default_cache
+
+
+@dataclass
+class JobResult:
+    index: int
+    status: str  # "done", "error", "timeout" or "cancelled"
+    counts: dict = None
+    result: object = None
+    error: str = None
+    queue_wait: float = 0.0  # seconds between submission and a worker thread starting the job
+    exec_time: float = 0.0   # seconds in the worker (transpile and backend.run(...).result())
+
+
+@dataclass
+class ExecutorStats:
+    submitted: int = 0
+    done: int = 0
+    errors: int = 0
+    timeouts: int = 0
+    cancelled: int = 0
+    queue_waits: list = field(default_factory=list)
+    exec_times: list = field(default_factory=list)
+    started_at: float = None
+    finished_at: float = None
+
+    _COUNTERS = {"done": "done", "error": "errors", "timeout": "timeouts", "cancelled": "cancelled"}
+
+    def record(self, r):
+        self.finished_at = time.perf_counter()
+        name = self._COUNTERS[r.status]
+        setattr(self, name, getattr(self, name) + 1)
+        if r.status in ("done", "error"):
+            self.queue_waits.append(r.queue_wait)
+            self.exec_times.append(r.exec_time)
+
+    def summary(self):
+        wall = (self.finished_at - self.started_at) if self.started_at is not None else 0.0
+        finished = self.done + self.errors
+
+        def med(xs):
+            return statistics.median(xs) if xs else 0.0
+        return {
+            "submitted": self.submitted, "done": self.done, "errors": self.errors,
+            "timeouts": self.timeouts, "cancelled": self.cancelled,
+            "wall_s": wall, "jobs_per_s": finished / wall if wall > 0 else 0.0,
+            "queue_wait_median_s": med(self.queue_waits),
+            "queue_wait_max_s": max(self.queue_waits, default=0.0),
+            "exec_median_s": med(self.exec_times),
+            "exec_mean_s": statistics.fmean(self.exec_times) if self.exec_times else 0.0,
+        }
+
+
+def _set_started(started, t):
+    if not started.done():
+        started.set_result(t)
+
+
+class AsyncExecutor:
+    """Bounded concurrent execution of circuits on one backend."""
+
+    def __init__(self, backend, max_workers=None, timeout=None, threads_per_job=1, transpile=True):
+        self.backend = backend
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.transpile = transpile
+        # one simulator thread per job: parallelism comes from running jobs side by side.
+        # max_parallel_threads is an Aer option; other backends would reject or warn on it
+        accepts = hasattr(getattr(backend, "options", None), "max_parallel_threads")
+        self.run_options = {"max_parallel_threads": threads_per_job} if threads_per_job and accepts else {}
+        self.stats = ExecutorStats()
+        self._pool = None
+        self._slots = None
+        self._tasks = set()
+
+    async def __aenter__(self):
+        self._pool = ThreadPoolExecutor(self.max_workers, thread_name_prefix="aer-job")
+        self._slots = asyncio.Semaphore(self.max_workers)
+        return self
+
+    async def __aexit__(self, *exc):
+        self.cancel_all()
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def _execute(self, circuit, options, loop, started):
+        loop.call_soon_threadsafe(_set_started, started, time.perf_counter())
+        tqc = default_cache().transpile(circuit, self.backend) if self.transpile else circuit
+        return self.backend.run(tqc, **options).result()
+
+    async def _job(self, index, circuit, timeout, options):
+        queued = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        started = loop.create_future()
+        work = None
+        try:
+            await self._slots.acquire()
+            work = self._pool.submit(self._execute, circuit, options, loop, started)
+            # the slot is held until the worker thread returns, even after a timeout
+            work.add_done_callback(lambda _: loop.call_soon_threadsafe(self._slots.release))
+            t0 = await asyncio.shield(started)  # timeout and exec_time count from here
+            try:
+                result = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(work)), timeout)
+            except asyncio.TimeoutError:
+                r = JobResult(index, "timeout", queue_wait=t0 - queued, exec_time=time.perf_counter() - t0)
+            except Exception as e:
+                r = JobResult(index, "error", error=f"{type(e).__name__}: {e}",
+                              queue_wait=t0 - queued, exec_time=time.perf_counter() - t0)
+            else:
+                counts = None
+                try:
+                    counts = result.get_counts()
+                except Exception:
+                    pass  # no measurements (e.g. save_statevector)
+                r = JobResult(index, "done", counts=counts, result=result,
+                              queue_wait=t0 - queued, exec_time=time.perf_counter() - t0)
+        except asyncio.CancelledError:
+            if work is not None:
+                work.cancel()  # no effect once the worker has started; its result is then dropped
+            r = JobResult(index, "cancelled", queue_wait=time.perf_counter() - queued)
+            self.stats.record(r)
+            raise
+        self.stats.record(r)
+        return r
+
+    def submit(self, circuit, index=0, timeout=None, **run_options):
+        """Schedule one circuit; returns an asyncio.Task resolving to a JobResult."""
+        options = {**self.run_options, **run_options}
+        if self.stats.started_at is None:
+            self.stats.started_at = time.perf_counter()
+        task = asyncio.ensure_future(self._job(index, circuit, timeout or self.timeout, options))
+        self.stats.submitted += 1
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def as_completed(self, circuits, timeout=None, **run_options):
+        """Submit all circuits and yield JobResults in completion order."""
+        tasks = [self.submit(c, i, timeout, **run_options) for i, c in enumerate(circuits)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    yield await next_done
+                except asyncio.CancelledError:
+                    continue
+        finally:
+            for t in tasks:  # consumer stopped early: do not leave queued jobs behind
+                t.cancel()
+
+    async def run_all(self, circuits, timeout=None, **run_options):
+        """All JobResults, in submission order."""
+        out = [None] * len(circuits)
+        async for r in self.as_completed(circuits, timeout, **run_options):
+            out[r.index] = r
+        return out
+
+    def cancel_all(self):
+        for t in list(self._tasks):
+            t.cancel()
+
+
+def run_circuits(circuits, backend, max_workers=None, timeout=None, **run_options):
+    """Blocking helper: run circuits concurrently, return (results, stats summary)."""
+    async def go():
+        async with AsyncExecutor(backend, max_workers=max_workers, timeout=timeout) as ex:
+            results = await ex.run_all(circuits, **run_options)
+            return results, ex.stats.summary()
+    return asyncio.run(go())
+
+
+def _random_circuits(n_jobs, n_qubits, depth, seed=0):
+    import numpy as np
+    from qiskit import QuantumCircuit
+    rng = np.random.default_rng(seed)
+    circuits = []
+    for _ in range(n_jobs):
+        qc = QuantumCircuit(n_qubits)
+        for layer in range(depth):
+            for q in range(n_qubits):
+                qc.ry(float(rng.uniform(0, np.pi)), q)
+            for q in range(layer % 2, n_qubits - 1, 2):
+                qc.cx(q, q + 1)
+        qc.measure_all()
+        circuits.append(qc)
+    return circuits
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Sequential vs asyncio execution of many Aer jobs")
+    p.add_argument("--jobs", type=int, default=200)
+    p.add_argument("--qubits", type=int, default=10)
+    p.add_argument("--depth", type=int, default=10)
+    p.add_argument("--shots", type=int, default=1024)
+    p.add_argument("--workers", type=int, default=os.cpu_count())
+    p.add_argument("--timeout", type=float, default=None)
+    args = p.parse_args(argv)
+
+    from qiskit_aer import AerSimulator
+    backend = AerSimulator()
+    circuits = _random_circuits(args.jobs, args.qubits, args.depth)
+    print(f"{args.jobs} circuits, {args.qubits} qubits, depth {args.depth}, {args.shots} shots, "
+          f"{args.workers} worker(s)")
+
+    cache = default_cache()
+    for qc in circuits:  # warm the transpile cache so both runs time execution only
+        cache.transpile(qc, backend)
+    t0 = time.perf_counter()
+    for qc in circuits:
+        backend.run(cache.transpile(qc, backend), shots=args.shots).result()
+    t_seq = time.perf_counter() - t0
+    print(f"  sequential run().result() : {t_seq:.2f} s ({args.jobs / t_seq:.1f} jobs/s)")
+
+    results, stats = run_circuits(circuits, backend, max_workers=args.workers, timeout=args.timeout,
+                                  shots=args.shots)
+    print(f"  async executor            : {stats['wall_s']:.2f} s ({stats['jobs_per_s']:.1f} jobs/s), "
+          f"x{t_seq / stats['wall_s']:.1f}")
+    print(f"    done {stats['done']}, errors {stats['errors']}, timeouts {stats['timeouts']}, "
+          f"cancelled {stats['cancelled']}")
+    print(f"    queue wait median {stats['queue_wait_median_s'] * 1e3:.1f} ms "
+          f"(max {stats['queue_wait_max_s'] * 1e3:.1f} ms), "
+          f"execution median {stats['exec_median_s'] * 1e3:.1f} ms")
+    print(" ", cache.report())
+
+
+if __name__ == "__main__":
+    main()
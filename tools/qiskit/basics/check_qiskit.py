@@ -53,13 +53,16 @@ def main():
         try:
             backend = Aer.get_backend('aer_simulator')
             print("Backend:", backend)
-            from qiskit import QuantumCircuit, transpile
+            from qiskit import QuantumCircuit
+            from transpile_cache import default_cache
+            cache = default_cache()
             qc = QuantumCircuit(1,1)
             qc.h(0); qc.measure(0,0)
-            tq = transpile(qc, backend)
+            tq = cache.transpile(qc, backend)
             job = backend.run(tq, shots=64)
             res = job.result()
             print("counts:", res.get_counts())
+            print(cache.report())
         except Exception:
             traceback.print_exc()
     else:
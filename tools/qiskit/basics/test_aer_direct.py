@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 # Petit test : utiliser Aer depuis le package qiskit_aer installé directement
-from qiskit import QuantumCircuit, transpile
+from qiskit import QuantumCircuit
 import qiskit
+from transpile_cache import default_cache
 print("qiskit version:", qiskit.__version__)
 
 try:
@@ -15,10 +16,12 @@ try:
     qc = QuantumCircuit(1, 1)
     qc.h(0)
     qc.measure(0, 0)
-    tq = transpile(qc, backend)
+    # transpilation en cache (mémoire, et disque si $MATHSHPC_TRANSPILE_CACHE est défini)
+    tq = default_cache().transpile(qc, backend)
     job = backend.run(tq, shots=256)
     res = job.result()
     print("counts:", res.get_counts())
+    print(default_cache().report())
 except Exception as e:
     import traceback
     print("Error using qiskit_aer:", type(e).__name__, e)
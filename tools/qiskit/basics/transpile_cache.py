@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Transpilation cache for repeated backend submissions.
+
+transpile() often dominates the latency of running small circuits. This
+module caches transpiled circuits under a key built from
+
+  - a structural hash of the circuit (registers, gates, qubit/clbit
+    arguments, numeric parameter values, unbound parameter expressions,
+    and the definition or matrix of every non-standard gate),
+  - the backend target (name, version, qubit count, supported operations,
+    coupling map) and the Qiskit version,
+  - the optimization level and any other transpile() options.
+
+Entries live in an in-memory LRU; with a cache directory (argument, or
+$MATHSHPC_TRANSPILE_CACHE for the module-level cache) they are also
+written as QPY files and reloaded by later processes. A parameterized
+circuit is transpiled once as a template; parameter_values (by Parameter
+or by name) are bound on the cached result afterwards. Every call returns
+a copy carrying the input circuit's name and metadata, so results can be
+looked up with get_counts(qc) and the cached template is never modified.
+
+Usage:
+  python3 transpile_cache.py                      # latency demo, cold vs cached
+  MATHSHPC_TRANSPILE_CACHE=/tmp/tc python3 transpile_cache.py
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+DEFAULT_MAXSIZE = 128
+
+
+def _param_token(p):
+    if hasattr(p, "parameters") and p.parameters:
+        return f"expr:{p}"  # unbound: bound later by parameter name
+    try:
+        return repr(complex(p))
+    except (TypeError, ValueError):
+        return repr(p)
+
+
+def _op_token(op):
+    """What defines op: name and parameters, plus for non-standard gates the
+    definition (hashed recursively) or, for opaque gates, the matrix.
+
+    Custom gates can share a name while doing different things, and library
+    gates such as PauliEvolutionGate keep their operator outside params.
+    """
+    token = repr((op.name, op.num_qubits, getattr(op, "ctrl_state", None),
+                  tuple(_param_token(p) for p in op.params)))
+    if getattr(op, "_standard_gate", None) is not None:
+        return token
+    definition = op.definition
+    if definition is not None:
+        return f"{token}def:{circuit_hash(definition)}"
+    try:
+        return f"{token}mat:{hashlib.sha256(np.asarray(op.to_matrix(), dtype=complex).tobytes()).hexdigest()}"
+    except Exception:
+        return token  # measure, reset, barrier, ...: fixed by the name
+
+
+def circuit_hash(qc):
+    """Structural SHA-256 of a QuantumCircuit."""
+    h = hashlib.sha256()
+    h.update(repr((qc.num_qubits, qc.num_clbits,
+                   [(r.name, r.size) for r in qc.qregs], [(r.name, r.size) for r in qc.cregs],
+                   _param_token(qc.global_phase))).encode())
+    for inst in qc.data:
+        h.update(repr((_op_token(inst.operation),
+                       tuple(qc.find_bit(q).index for q in inst.qubits),
+                       tuple(qc.find_bit(c).index for c in inst.clbits))).encode())
+    return h.hexdigest()
+
+
+def target_key(backend):
+    """Description of what transpile() targets on this backend."""
+    import qiskit
+    target = getattr(backend, "target", None)
+    parts = [getattr(backend, "name", type(backend).__name__),
+             str(getattr(backend, "backend_version", "")), f"qiskit-{qiskit.__version__}"]
+    if target is not None:
+        parts.append(str(target.num_qubits))
+        parts.append(",".join(sorted(target.operation_names)))
+        cmap = target.build_coupling_map()
+        if cmap is not None:
+            parts.append(";".join(f"{a}-{b}" for a, b in sorted(cmap.get_edges())))
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()[:16]
+
+
+class TranspileCache:
+    """LRU cache of transpiled circuits with optional QPY persistence."""
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, directory=None):
+        self.maxsize = maxsize
+        self.directory = directory
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()  # transpile() is called from executor threads (async_executor)
+        self._targets = {}  # id(backend) -> (backend, key)
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0}
+
+    def _target(self, backend):
+        entry = self._targets.get(id(backend))
+        if entry is None or entry[0] is not backend:
+            entry = (backend, target_key(backend))
+            self._targets[id(backend)] = entry
+        return entry[1]
+
+    def key(self, qc, backend, optimization_level=None, **options):
+        opts = ",".join(f"{k}={options[k]!r}" for k in sorted(options))
+        return f"{circuit_hash(qc)[:32]}-{self._target(backend)}-o{optimization_level}-" \
+               f"{hashlib.sha256(opts.encode()).hexdigest()[:8]}"
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.qpy")
+
+    def _load(self, key):
+        if not self.directory:
+            return None
+        try:
+            from qiskit import qpy
+            with open(self._path(key), "rb") as f:
+                return qpy.load(f)[0]
+        except Exception:
+            return None  # missing, unreadable or written by another QPY version
+
+    def _store(self, key, tqc):
+        if not self.directory:
+            return
+        try:
+            from qiskit import qpy
+            os.makedirs(self.directory, exist_ok=True)
+            tmp = f"{self._path(key)}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                qpy.dump(tqc, f)
+            os.replace(tmp, self._path(key))
+        except Exception:
+            pass  # persistence is best effort, the memory cache still applies
+
+    def transpile(self, qc, backend, optimization_level=None, parameter_values=None, **options):
+        """Cached transpile(qc, backend, ...); binds parameter_values afterwards."""
+        key = self.key(qc, backend, optimization_level, **options)
+        with self._lock:
+            tqc = self._entries.get(key)
+            if tqc is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+        if tqc is None:
+            # load or transpile outside the lock; two threads missing on the same key both transpile
+            tqc = self._load(key)
+            if tqc is not None:
+                outcome = "disk_hits"
+            else:
+                from qiskit import transpile
+                outcome = "misses"
+                tqc = transpile(qc, backend, optimization_level=optimization_level, **options)
+                self._store(key, tqc)
+            with self._lock:
+                self.stats[outcome] += 1
+                self._entries[key] = tqc
+                if len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        if parameter_values is not None:
+            if not isinstance(parameter_values, dict):
+                # positional values follow qc.parameters (sorted by name), as in assign_parameters
+                parameter_values = dict(zip(qc.parameters, parameter_values))
+            # bind by name: a template reloaded from disk has its own Parameter objects
+            by_name = {p.name: p for p in tqc.parameters}
+            tqc = tqc.assign_parameters({by_name[getattr(p, "name", p)]: v for p, v in parameter_values.items()
+                                         if getattr(p, "name", p) in by_name})
+        else:
+            tqc = tqc.copy()  # the cached entry is shared; callers get their own circuit
+        # results are looked up by experiment name (get_counts(qc)): keep the caller's
+        tqc.name = qc.name
+        tqc.metadata = dict(qc.metadata or {})
+        return tqc
+
+    @property
+    def hit_rate(self):
+        total = sum(self.stats.values())
+        return (self.stats["hits"] + self.stats["disk_hits"]) / total if total else 0.0
+
+    def report(self):
+        return (f"transpile cache: {self.stats['hits']} hits, {self.stats['disk_hits']} disk hits, "
+                f"{self.stats['misses']} misses, hit rate {self.hit_rate:.0%}, "
+                f"{len(self._entries)}/{self.maxsize} entries"
+                + (f", dir {self.directory}" if self.directory else ""))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_default = None
+
+
+def default_cache():
+    global _default
+    if _default is None:
+        _default = TranspileCache(directory=os.environ.get("MATHSHPC_TRANSPILE_CACHE"))
+    return _default
+
+
+def transpile_cached(qc, backend, optimization_level=None, parameter_values=None, **options):
+    """transpile() through the module-level cache."""
+    return default_cache().transpile(qc, backend, optimization_level, parameter_values, **options)
+
+
+def main():
+    from qiskit import QuantumCircuit
+    from qiskit.circuit import Parameter
+    from qiskit_aer import AerSimulator
+
+    backend = AerSimulator()
+    cache = default_cache()
+
+    qc = QuantumCircuit(3, 3)
+    qc.h(0)
+    qc.cx(0, 1)
+    qc.cx(1, 2)
+    qc.measure(range(3), range(3))
+
+    theta = Parameter("theta")
+    pqc = QuantumCircuit(2, 2)
+    pqc.ry(theta, 0)
+    pqc.cx(0, 1)
+    pqc.measure([0, 1], [0, 1])
+
+    for label, fn in (("static circuit", lambda i: cache.transpile(qc, backend)),
+                      ("parameterized", lambda i: cache.transpile(pqc, backend, parameter_values=[0.1 * i]))):
+        times = []
+        for i in range(20):
+            t0 = time.perf_counter()
+            tqc = fn(i)
+            times.append(time.perf_counter() - t0)
+        print(f"{label:15s}: first {times[0] * 1e3:.2f} ms, cached median "
+              f"{sorted(times[1:])[len(times[1:]) // 2] * 1e3:.3f} ms")
+    counts = backend.run(tqc, shots=256, seed_simulator=1).result().get_counts()
+    print("last bound circuit counts:", counts)
+
+    # same structure, different names: the cached result must answer to each circuit's own name
+    twins = [qc.copy(name=f"twin-{i}") for i in range(2)]
+    tqcs = [cache.transpile(t, backend) for t in twins]
+    assert tqcs[0] is not tqcs[1] and [t.name for t in tqcs] == [t.name for t in twins]
+    result = backend.run(tqcs, shots=64, seed_simulator=1).result()
+    print("twin circuits counts:", [result.get_counts(t) for t in twins])
+    print(cache.report())
+
+
+if __name__ == "__main__":
+    main()
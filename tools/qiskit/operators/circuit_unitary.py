@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Batched unitary extraction for Qiskit circuits.
+
+circuit_unitary(qc) evolves all 2^n computational basis columns at once:
+the identity is viewed as a tensor of shape (2,)*n + (2^n,) (row qubits,
+then a trailing column axis) and every gate is applied in place to its
+row axes with statevector_sim.apply_gate. That is one pass over a 4^n
+array per gate instead of 2^n separate statevector runs. Gates are fused
+into blocks of up to statevector_sim.FUSION_WIDTH qubits first
+(gate_fusion), which cuts the number of passes.
+
+Gate matrices are memoised by statevector_sim.gate_matrix, and finished
+unitaries are kept in a small LRU cache keyed by the circuit structure
+(gate types, qubits, parameter values, global phase; the matrix or
+definition of non-standard gates), so asking again for the same block
+costs a hash. Cached results are returned read-only; copy
+them before modifying.
+
+Usage:
+  python3 circuit_unitary.py                      # benchmark vs Operator(qc), 4..12 qubits
+  python3 circuit_unitary.py --max-qubits 10 --depth 6
+"""
+import argparse
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from gate_fusion import fuse_gates
+from statevector_sim import (CHUNK_ELEMS, FUSION_WIDTH, MAX_DENSE_QUBITS, apply_gate, flatten_circuit, gate_matrix,
+                             qubit_axes, random_circuit, standard_gate_key)
+
+CACHE_SIZE = 32
+
+
+def _op_key(op):
+    """Hashable identity of one operation.
+
+    Standard gates are identified by type and angles. Any other gate can
+    hide its operator outside params (PauliEvolutionGate, UnitaryGate, two
+    custom gates both named "block"), so its matrix, or for wide gates its
+    definition, is part of the key, as in flatten_circuit.
+    """
+    key = standard_gate_key(op)
+    if key is not None:
+        return key
+    params = []
+    for p in op.params:
+        try:
+            params.append(complex(p))
+        except (TypeError, ValueError):
+            params.append(np.asarray(p).tobytes() if isinstance(p, np.ndarray) else str(p))
+    key = (op.name, type(op).__qualname__, op.num_qubits, getattr(op, "ctrl_state", None), tuple(params))
+    if op.num_qubits <= MAX_DENSE_QUBITS or op.definition is None:
+        try:
+            return key + (gate_matrix(op).tobytes(),)
+        except Exception:
+            pass  # no matrix: fall back to the definition
+    if op.definition is not None:
+        return key + (circuit_key(op.definition),)
+    return key  # non-unitary instruction (barrier, measure, ...), defined by its name
+
+
+def circuit_key(qc):
+    """Hashable description of the circuit's gate sequence."""
+    ops = tuple((_op_key(inst.operation), tuple(qc.find_bit(q).index for q in inst.qubits)) for inst in qc.data)
+    return (qc.num_qubits, str(qc.global_phase), ops)
+
+
+class UnitaryBuilder:
+    """Builds circuit unitaries and remembers the last `maxsize` of them."""
+
+    def __init__(self, maxsize=CACHE_SIZE, dtype=np.complex128, chunk_elems=CHUNK_ELEMS,
+                 fusion_width=FUSION_WIDTH):
+        self.maxsize = maxsize
+        self.fusion_width = fusion_width
+        self.dtype = dtype
+        self.chunk_elems = chunk_elems
+        self._cache = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def build(self, qc):
+        """Unitary of qc, same convention as Operator(qc).data."""
+        n = qc.num_qubits
+        dim = 1 << n
+        u = np.eye(dim, dtype=self.dtype)
+        ops, phase = flatten_circuit(qc)
+        if self.fusion_width:
+            ops = fuse_gates(ops, self.fusion_width)
+        tensor = u.reshape((2,) * n + (dim,))
+        for mat, qubits in ops:
+            apply_gate(tensor, mat.astype(self.dtype, copy=False), qubit_axes(qubits, n), self.chunk_elems)
+        if phase:
+            u *= np.exp(1j * phase)
+        return u
+
+    def __call__(self, qc):
+        key = circuit_key(qc)
+        u = self._cache.get(key)
+        if u is not None:
+            self._cache.move_to_end(key)
+            self.stats["hits"] += 1
+            return u
+        self.stats["misses"] += 1
+        u = self.build(qc)
+        u.setflags(write=False)
+        self._cache[key] = u
+        if len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+        return u
+
+    def clear(self):
+        self._cache.clear()
+
+
+_default = UnitaryBuilder()
+
+
+def circuit_unitary(qc):
+    """Cached unitary of qc (read-only array) from the module-level builder."""
+    return _default(qc)
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Batched unitary extraction benchmark")
+    p.add_argument("--min-qubits", type=int, default=4)
+    p.add_argument("--max-qubits", type=int, default=12)
+    p.add_argument("--step", type=int, default=2)
+    p.add_argument("--depth", type=int, default=4)
+    args = p.parse_args(argv)
+
+    from qiskit.quantum_info import Operator
+
+    print(f"Random circuits, depth {args.depth}")
+    print(f"{'n':>3}  {'gates':>6}  {'U MiB':>7}  {'batched s':>9}  {'cached s':>9}  {'Operator s':>10}  max|diff|")
+    builder = UnitaryBuilder()
+    for n in range(args.min_qubits, args.max_qubits + 1, args.step):
+        qc = random_circuit(n, args.depth)
+        t0 = time.perf_counter()
+        u = builder(qc)
+        t_build = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        builder(qc)
+        t_hit = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        ref = Operator(qc).data
+        t_ref = time.perf_counter() - t0
+        print(f"{n:3d}  {qc.size():6d}  {u.nbytes / 2**20:7.1f}  {t_build:9.4f}  {t_hit:9.6f}  "
+              f"{t_ref:10.4f}  {np.max(np.abs(u - ref)):.1e}")
+        builder.clear()
+    print("  cache stats:", builder.stats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Matrix product state (MPS) simulator for shallow, low-entanglement circuits.
+
+Qubit q lives on site q as a tensor of shape (chi_left, 2, chi_right);
+memory is O(n chi^2) instead of O(2^n). The MPS is kept in mixed canonical
+form around an orthogonality center, so the SVD that splits a two-qubit
+gate back into two sites is an optimal truncation:
+
+  - singular values are dropped while the discarded weight of that SVD
+    stays below truncation_error, and at most max_bond are kept;
+  - gates on non-adjacent qubits are routed with SWAPs and moved back;
+  - discarded weights are accumulated into a fidelity estimate.
+
+Circuits go through statevector_sim.flatten_circuit (same QuantumCircuit
+input; three-qubit and composite gates are expanded to one- and two-qubit
+gates). Supports amplitudes, exact-marginal sampling of counts (Qiskit
+key format) and Pauli-sum expectations (pauli_expectation.pauli_terms).
+
+Usage:
+  python3 mps_sim.py                              # 10..100 qubits vs statevector
+  python3 mps_sim.py --max-bond 128 --depth 8 --sizes 20 50 100 200
+"""
+import argparse
+import time
+
+import numpy as np
+
+from statevector_sim import flatten_circuit
+
+DEFAULT_MAX_BOND = 64
+DEFAULT_TRUNCATION_ERROR = 1e-12
+
+_SWAP = np.array([[1, 0, 0, 0], [0, 0, 1, 0], [0, 1, 0, 0], [0, 0, 0, 1]], dtype=complex)
+
+
+class MatrixProductState:
+    """MPS of n qubits, initialised to |0...0>."""
+
+    def __init__(self, n, max_bond=DEFAULT_MAX_BOND, truncation_error=DEFAULT_TRUNCATION_ERROR,
+                 dtype=np.complex128):
+        self.n = n
+        self.max_bond = max_bond
+        self.truncation_error = truncation_error
+        zero = np.zeros((1, 2, 1), dtype=dtype)
+        zero[0, 0, 0] = 1.0
+        self.tensors = [zero.copy() for _ in range(n)]
+        self.center = 0
+        self.discarded = 0.0  # summed discarded weight of all truncations
+        self.fidelity = 1.0   # product of (1 - discarded weight) per truncation
+
+    # --- canonical form ------------------------------------------------------------
+
+    def _move_center(self, site):
+        t = self.tensors
+        while self.center < site:
+            c = self.center
+            a, d, b = t[c].shape
+            q, r = np.linalg.qr(t[c].reshape(a * d, b))
+            t[c] = q.reshape(a, d, -1)
+            t[c + 1] = np.tensordot(r, t[c + 1], axes=1)
+            self.center += 1
+        while self.center > site:
+            c = self.center
+            a, d, b = t[c].shape
+            q, r = np.linalg.qr(t[c].reshape(a, d * b).T)
+            t[c] = q.T.reshape(-1, d, b)
+            t[c - 1] = np.tensordot(t[c - 1], r.T, axes=1)
+            self.center -= 1
+
+    # --- gates ---------------------------------------------------------------------
+
+    def apply_1q(self, mat, q):
+        self.tensors[q] = np.einsum("ij,ajb->aib", mat, self.tensors[q])
+
+    def _apply_adjacent(self, mat, i, low_on_left):
+        """4x4 gate on sites (i, i+1); low_on_left says the gate's qarg 0 is site i."""
+        self._move_center(i)
+        g = mat.reshape(2, 2, 2, 2)  # [out_hi, out_lo, in_hi, in_lo]
+        theta = np.tensordot(self.tensors[i], self.tensors[i + 1], axes=1)  # (a, s_i, s_i+1, b)
+        if low_on_left:
+            theta = np.einsum("xyuv,avub->ayxb", g, theta)
+        else:
+            theta = np.einsum("xyuv,auvb->axyb", g, theta)
+        a, _, _, b = theta.shape
+        u, s, vh = np.linalg.svd(theta.reshape(a * 2, 2 * b), full_matrices=False)
+        keep = self._keep(s)
+        total = float(np.sum(s ** 2))
+        lost = float(np.sum(s[keep:] ** 2)) / total if total > 0 else 0.0
+        if lost > 0:
+            self.discarded += lost
+            self.fidelity *= 1.0 - lost
+        s = s[:keep] / np.sqrt(np.sum(s[:keep] ** 2) / total)  # renormalise
+        self.tensors[i] = u[:, :keep].reshape(a, 2, keep)
+        self.tensors[i + 1] = (s[:, None] * vh[:keep]).reshape(keep, 2, b)
+        self.center = i + 1
+
+    def _keep(self, s):
+        w = s ** 2
+        total = w.sum()
+        if total == 0:
+            return 1
+        # tail[k] = weight discarded when keeping k values
+        tail = np.concatenate([np.cumsum(w[::-1])[::-1], [0.0]]) / total
+        keep = int(np.argmax(tail <= self.truncation_error))
+        return max(1, min(keep, self.max_bond))
+
+    def apply_2q(self, mat, q0, q1):
+        """Gate on qargs (q0, q1), Qiskit matrix ordering (q0 = low bit)."""
+        lo, hi = min(q0, q1), max(q0, q1)
+        for site in range(hi - 1, lo, -1):  # bring hi next to lo
+            self._apply_adjacent(_SWAP, site, True)
+        self._apply_adjacent(mat, lo, q0 == lo)
+        for site in range(lo + 1, hi):  # and back
+            self._apply_adjacent(_SWAP, site, True)
+
+    def apply_circuit(self, qc):
+        ops, phase = flatten_circuit(qc, max_qubits=2)
+        for mat, qubits in ops:
+            if len(qubits) == 1:
+                self.apply_1q(mat, qubits[0])
+            else:
+                self.apply_2q(mat, qubits[0], qubits[1])
+        if phase:
+            self.tensors[self.center] = self.tensors[self.center] * np.exp(1j * phase)
+        return self
+
+    # --- queries ---------------------------------------------------------------------
+
+    @property
+    def bond_dims(self):
+        return [t.shape[2] for t in self.tensors[:-1]]
+
+    @property
+    def nbytes(self):
+        return sum(t.nbytes for t in self.tensors)
+
+    def amplitude(self, bits):
+        """<bits|psi>; bits is an int or a Qiskit bitstring (qubit 0 rightmost)."""
+        if isinstance(bits, str):
+            bits = int(bits.replace(" ", ""), 2)
+        v = np.ones(1, dtype=self.tensors[0].dtype)
+        for q, t in enumerate(self.tensors):
+            v = v @ t[:, (bits >> q) & 1, :]
+        return complex(v[0])
+
+    def to_statevector(self):
+        """Dense state (Statevector ordering); only for small n."""
+        psi = self.tensors[0]
+        for t in self.tensors[1:]:
+            psi = np.tensordot(psi, t, axes=1)
+        # axes are (1, s_0, ..., s_n-1, 1): qubit 0 must be the fastest index
+        return psi.reshape((2,) * self.n).transpose(range(self.n - 1, -1, -1)).reshape(-1)
+
+    def sample_bits(self, shots, seed=None):
+        """(distinct outcomes as (m, n) uint8 bit arrays, multiplicities (m,)).
+
+        Sites are sampled left to right from exact conditional marginals;
+        shots that share a prefix share one environment vector, so the work
+        scales with the number of distinct prefixes, not with shots.
+        """
+        rng = np.random.default_rng(seed)
+        self._move_center(0)  # sites 1.. right-orthonormal: norms of partial contractions are marginals
+        env = np.ones((1, 1), dtype=self.tensors[0].dtype)
+        counts = np.array([shots])
+        bits = np.zeros((1, 0), dtype=np.uint8)
+        for t in self.tensors:
+            cand = np.einsum("ma,asb->msb", env, t)
+            p = np.sum(np.abs(cand) ** 2, axis=2)
+            p1 = p[:, 1] / np.maximum(p.sum(axis=1), 1e-300)
+            ones = rng.binomial(counts, np.clip(p1, 0.0, 1.0))
+            branches = []
+            for s, c in ((0, counts - ones), (1, ones)):
+                sel = c > 0
+                if np.any(sel):
+                    norm = np.sqrt(p[sel, s])[:, None]
+                    branches.append((cand[sel, s] / norm, c[sel],
+                                     np.concatenate([bits[sel], np.full((sel.sum(), 1), s, np.uint8)], 1)))
+            env = np.concatenate([b[0] for b in branches])
+            counts = np.concatenate([b[1] for b in branches])
+            bits = np.concatenate([b[2] for b in branches])
+        return bits, counts
+
+    def sample_counts(self, shots=1024, seed=None, qc=None):
+        """Counts dict in Qiskit key format.
+
+        With qc, its final measurements decide which qubits land in which
+        clbits (and register spacing); otherwise every qubit is measured.
+        """
+        bits, counts = self.sample_bits(shots, seed)
+        if qc is None or not any(i.operation.name == "measure" for i in qc.data):
+            keys = bits[:, ::-1] + ord("0")
+            width, sizes = self.n, [self.n]
+        else:
+            from statevector_sampler import measurement_map
+            measured = measurement_map(qc)
+            width = qc.num_clbits
+            keys = np.full((len(bits), width), ord("0"), dtype=np.uint8)
+            for clbit, qubit in measured.items():
+                keys[:, width - 1 - clbit] = bits[:, qubit] + ord("0")
+            sizes = [creg.size for creg in reversed(qc.cregs)]
+        strings = keys.astype(np.uint8).view(f"S{width}").ravel().astype(f"U{width}").tolist()
+        if len(sizes) > 1 and sum(sizes) == width:
+            cuts = np.cumsum([0] + sizes)
+            strings = [" ".join(k[a:b] for a, b in zip(cuts[:-1], cuts[1:])) for k in strings]
+        out = {}
+        for k, c in zip(strings, counts.tolist()):
+            out[k] = out.get(k, 0) + c
+        return out
+
+    def expectation(self, op):
+        """<psi|op|psi> for a Pauli sum (SparsePauliOp, Pauli, label ...)."""
+        from pauli_expectation import pauli_terms
+        x, z, coeffs = pauli_terms(op)
+        if x.shape[1] != self.n:
+            raise ValueError(f"operator acts on {x.shape[1]} qubits, state has {self.n}")
+        local = {(0, 0): np.eye(2), (1, 0): np.array([[0, 1], [1, 0]]),
+                 (0, 1): np.diag([1, -1]), (1, 1): np.array([[0, -1], [1, 0]])}  # X^x Z^z
+        support = [np.flatnonzero(xr | zr) for xr, zr in zip(x, z)]
+        total = 0.0
+        for k in sorted(range(len(coeffs)), key=lambda k: support[k][0] if len(support[k]) else -1):
+            sites = support[k]
+            if not len(sites):
+                total += coeffs[k] * self.norm_squared()
+                continue
+            lo, hi = sites[0], sites[-1]
+            self._move_center(lo)  # sites left of lo contract to identity, right of hi too
+            env = None
+            for q in range(lo, hi + 1):
+                t = self.tensors[q]
+                ot = np.einsum("ij,ajb->aib", local[(int(x[k, q]), int(z[k, q]))], t)
+                if env is None:
+                    env = np.einsum("asb,asc->bc", t.conj(), ot)
+                else:
+                    env = np.einsum("ac,asb,csd->bd", env, t.conj(), ot, optimize=True)
+            total += coeffs[k] * np.trace(env)
+        return complex(total)
+
+    def norm_squared(self):
+        return float(np.sum(np.abs(self.tensors[self.center]) ** 2))
+
+
+def simulate_mps(qc, max_bond=DEFAULT_MAX_BOND, truncation_error=DEFAULT_TRUNCATION_ERROR):
+    """Run qc (final measurements ignored) and return its MatrixProductState."""
+    return MatrixProductState(qc.num_qubits, max_bond, truncation_error).apply_circuit(qc)
+
+
+def main(argv=None):
+    from statevector_sim import random_circuit, simulate
+
+    p = argparse.ArgumentParser(description="MPS vs statevector on shallow random circuits")
+    p.add_argument("--sizes", nargs="+", type=int, default=[10, 16, 20, 24, 50, 100])
+    p.add_argument("--depth", type=int, default=6)
+    p.add_argument("--max-bond", type=int, default=DEFAULT_MAX_BOND)
+    p.add_argument("--truncation-error", type=float, default=DEFAULT_TRUNCATION_ERROR)
+    p.add_argument("--shots", type=int, default=1000)
+    p.add_argument("--reference-max", type=int, default=24,
+                   help="largest n also run through the dense statevector engine")
+    args = p.parse_args(argv)
+
+    from qiskit.quantum_info import SparsePauliOp
+
+    print(f"Random brick circuits, depth {args.depth}, max bond {args.max_bond}, "
+          f"truncation error {args.truncation_error:g}")
+    print(f"{'n':>4}  {'MPS s':>7}  {'bond':>4}  {'MPS MiB':>7}  {'est.fid':>8}  "
+          f"{'sample s':>8}  {'<ZZ> s':>7}  {'SV s':>7}  {'SV MiB':>10}  |<mps|sv>|")
+    for n in args.sizes:
+        qc = random_circuit(n, args.depth)
+        t0 = time.perf_counter()
+        mps = simulate_mps(qc, args.max_bond, args.truncation_error)
+        t_mps = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        mps.sample_counts(args.shots, seed=1)
+        t_sample = time.perf_counter() - t0
+        zz = SparsePauliOp.from_sparse_list([("ZZ", [q, q + 1], 1.0) for q in range(n - 1)], num_qubits=n)
+        t0 = time.perf_counter()
+        mps.expectation(zz)
+        t_exp = time.perf_counter() - t0
+        sv_bytes = 16 * 2 ** n
+        line = (f"{n:4d}  {t_mps:7.3f}  {max(mps.bond_dims):4d}  {mps.nbytes / 2**20:7.2f}  "
+                f"{mps.fidelity:8.6f}  {t_sample:8.3f}  {t_exp:7.3f}")
+        if n <= args.reference_max:
+            t0 = time.perf_counter()
+            psi = simulate(qc)
+            t_sv = time.perf_counter() - t0
+            overlap = abs(np.vdot(mps.to_statevector(), psi))
+            line += f"  {t_sv:7.3f}  {sv_bytes / 2**20:10.1f}  {overlap:.8f}"
+        else:
+            line += f"  {'-':>7}  {sv_bytes / 2**20:10.3g}  (statevector impossible)"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
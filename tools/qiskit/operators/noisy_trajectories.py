@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""
+Monte Carlo (quantum trajectory) noise simulation.
+
+A density matrix of n qubits needs 4^n entries; a trajectory is a pure
+statevector (2^n) in which every noise channel {K_i} attached to a gate is
+replaced by one randomly chosen Kraus operator, picked with probability
+p_i = ||K_i psi||^2 and followed by renormalisation. Averaging observables
+and measurement outcomes over trajectories reproduces the density-matrix
+result, with a statistical error that shrinks as 1/sqrt(trajectories).
+
+  - Channels are lists of Kraus matrices (or Qiskit / Aer channels via
+    KrausChannel.from_qiskit), attached to gate names and/or qubits with a
+    TrajectoryNoiseModel. Mixed-unitary channels (depolarizing, bit and
+    phase flips) are sampled without touching the state; general channels
+    get p_i from the k-qubit reduced density matrix.
+  - Batches of trajectories run on a process pool. Batch b always uses
+    child b of SeedSequence(seed), so results do not depend on the number
+    of workers.
+  - Counts and expectation values are aggregated as batches arrive
+    (consumed in submission order). Running stops once every confidence
+    interval half-width is below `precision` (or at max_trajectories).
+
+Usage:
+  python3 noisy_trajectories.py                   # 6-qubit check vs DensityMatrix, 16-qubit run
+  python3 noisy_trajectories.py --qubits 20 --precision 0.005 --workers 8
+"""
+import argparse
+import os
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+
+from statevector_sim import apply_gate, flatten_circuit, qubit_axes
+
+_PAULIS = [np.eye(2), np.array([[0, 1], [1, 0]]), np.array([[0, -1j], [1j, 0]]), np.diag([1, -1])]
+
+
+class KrausChannel:
+    """Completely positive trace-preserving map given by Kraus operators."""
+
+    def __init__(self, kraus_ops, atol=1e-8):
+        ops = np.asarray(kraus_ops, dtype=complex)
+        if ops.ndim == 2:
+            ops = ops[None]
+        d = ops.shape[1]
+        if ops.shape[1:] != (d, d) or d & (d - 1):
+            raise ValueError(f"Kraus operators must be 2^k x 2^k matrices, got shape {ops.shape}")
+        if not np.allclose(np.einsum("kji,kjl->il", ops.conj(), ops), np.eye(d), atol=atol):
+            raise ValueError("Kraus operators are not trace preserving (sum K^dag K != I)")
+        self.ops = ops
+        self.num_qubits = d.bit_length() - 1
+        # mixed-unitary channel: every K^dag K is a multiple of I
+        gram = np.einsum("kji,kjl->kil", ops.conj(), ops)
+        weights = np.real(np.trace(gram, axis1=1, axis2=2)) / d
+        self.mixture = bool(np.allclose(gram, weights[:, None, None] * np.eye(d), atol=atol))
+        if self.mixture:
+            keep = weights > atol
+            self.probs = weights[keep] / weights[keep].sum()
+            self.unitaries = ops[keep] / np.sqrt(weights[keep])[:, None, None]
+            self.identity = [bool(np.allclose(u, u[0, 0] * np.eye(d), atol=atol)
+                                  and np.isclose(abs(u[0, 0]), 1.0)) for u in self.unitaries]
+
+    @classmethod
+    def from_qiskit(cls, channel):
+        """From a qiskit.quantum_info channel or a qiskit_aer QuantumError."""
+        from qiskit.quantum_info import Kraus
+        if hasattr(channel, "to_quantumchannel"):
+            channel = channel.to_quantumchannel()
+        return cls(Kraus(channel).data)
+
+    def __repr__(self):
+        kind = "mixed-unitary" if self.mixture else "general"
+        return f"KrausChannel({self.num_qubits} qubit(s), {len(self.ops)} ops, {kind})"
+
+
+def depolarizing(p, num_qubits=1):
+    """(1 - p) rho + p I / 2^k, as in qiskit_aer.noise.depolarizing_error."""
+    paulis = [np.array([[1.0]])]
+    for _ in range(num_qubits):
+        paulis = [np.kron(a, b) for a in paulis for b in _PAULIS]
+    m = len(paulis)
+    weights = [1 - p + p / m] + [p / m] * (m - 1)
+    return KrausChannel([np.sqrt(w) * P for w, P in zip(weights, paulis)])
+
+
+def bit_flip(p):
+    return KrausChannel([np.sqrt(1 - p) * _PAULIS[0], np.sqrt(p) * _PAULIS[1]])
+
+
+def phase_flip(p):
+    return KrausChannel([np.sqrt(1 - p) * _PAULIS[0], np.sqrt(p) * _PAULIS[3]])
+
+
+def amplitude_damping(gamma):
+    return KrausChannel([[[1, 0], [0, np.sqrt(1 - gamma)]], [[0, np.sqrt(gamma)], [0, 0]]])
+
+
+def phase_damping(lam):
+    return KrausChannel([[[1, 0], [0, np.sqrt(1 - lam)]], [[0, 0], [0, np.sqrt(lam)]]])
+
+
+class TrajectoryNoiseModel:
+    """Channels applied after matching gates.
+
+    add(channel, gates=("cx",), qubits=None): after every gate whose name is
+    in `gates` (all gates if None) and that touches `qubits` (any if None).
+    A k-qubit channel acts on the gate's qubits and needs a k-qubit gate; a
+    1-qubit channel acts on each qubit of the gate separately.
+    """
+
+    def __init__(self):
+        self.rules = []
+
+    def add(self, channel, gates=None, qubits=None):
+        if not isinstance(channel, KrausChannel):
+            from_qiskit = (type(channel).__module__ or "").startswith(("qiskit", "qiskit_aer"))
+            channel = KrausChannel.from_qiskit(channel) if from_qiskit else KrausChannel(channel)
+        self.rules.append((channel, None if gates is None else set([gates] if isinstance(gates, str) else gates),
+                           None if qubits is None else tuple(qubits)))
+        return self
+
+    def channels_for(self, name, qubits):
+        """[(channel, target qubits)] to apply after gate `name` on `qubits`."""
+        out = []
+        for channel, gates, where in self.rules:
+            if gates is not None and name not in gates:
+                continue
+            if channel.num_qubits == 1:
+                out.extend((channel, [q]) for q in qubits if where is None or q in where)
+            elif channel.num_qubits == len(qubits) and (where is None or tuple(qubits) == where):
+                out.append((channel, list(qubits)))
+        return out
+
+
+# --- one trajectory ----------------------------------------------------------------
+
+def compile_program(qc, noise):
+    """[(matrix, axes, [(channel, axes), ...])] and the global phase."""
+    n = qc.num_qubits
+    ops, phase = flatten_circuit(qc, names=True)
+    program = []
+    for mat, qubits, name in ops:
+        channels = [(ch, qubit_axes(qs, n)) for ch, qs in noise.channels_for(name, qubits)]
+        program.append((mat, qubit_axes(qubits, n), channels))
+    return program, phase
+
+
+def _apply_channel(tensor, channel, axes, rng):
+    if channel.mixture:
+        i = rng.choice(len(channel.probs), p=channel.probs)
+        if not channel.identity[i]:
+            apply_gate(tensor, channel.unitaries[i], axes)
+        return
+    # p_i = tr(K_i rho K_i^dag) from the reduced density matrix of the target qubits
+    others = [a for a in range(tensor.ndim) if a not in axes]
+    rho = np.tensordot(tensor, tensor.conj(), axes=(others, others))
+    order = sorted(axes)
+    perm = [order.index(a) for a in axes]
+    k = len(axes)
+    d = 1 << k
+    rho = rho.transpose(perm + [k + p for p in perm]).reshape(d, d)
+    probs = np.real(np.einsum("kab,bc,kac->k", channel.ops, rho, channel.ops.conj()))
+    probs = np.clip(probs, 0.0, None)
+    i = rng.choice(len(probs), p=probs / probs.sum())
+    apply_gate(tensor, channel.ops[i] / np.sqrt(probs[i]), axes)
+
+
+def run_trajectory(program, phase, n, rng):
+    psi = np.zeros(1 << n, dtype=complex)
+    psi[0] = 1.0
+    tensor = psi.reshape((2,) * n)
+    for mat, axes, channels in program:
+        apply_gate(tensor, mat, axes)
+        for channel, ch_axes in channels:
+            _apply_channel(tensor, channel, ch_axes, rng)
+    if phase:
+        psi *= np.exp(1j * phase)
+    return psi
+
+
+# --- worker side -----------------------------------------------------------------
+
+_WORKER = {}
+
+
+def measured_qubits(qc):
+    """{clbit: qubit} sampled for counts.
+
+    A circuit without classical bits reports every qubit; one with
+    classical bits but no measurement has nothing to count (as in Aer).
+    """
+    from statevector_sampler import measurement_map
+    measured = measurement_map(qc)
+    if not measured and not qc.num_clbits:
+        measured = {q: q for q in range(qc.num_qubits)}
+    return measured
+
+
+def _init_worker(qc, noise, observables, shots_per_trajectory):
+    from pauli_expectation import pauli_terms
+    measured = measured_qubits(qc)
+    program, phase = compile_program(qc, noise)
+    _WORKER.update(n=qc.num_qubits, program=program, phase=phase, measured=measured,
+                   qubits=set(measured.values()), terms=[pauli_terms(o) for o in observables],
+                   shots=shots_per_trajectory if measured else 0)
+
+
+def _run_batch(seed_seq, n_traj):
+    """Partial sums for n_traj trajectories: counts by outcome index, sum and sum of squares per observable."""
+    from pauli_expectation import pauli_expectations
+    from statevector_sampler import marginal_probabilities, sample_cdf
+    w = _WORKER
+    rng = np.random.default_rng(seed_seq)
+    m = len(w["terms"])
+    obs_sum, obs_sumsq = np.zeros(m), np.zeros(m)
+    outcomes = []
+    for _ in range(n_traj):
+        psi = run_trajectory(w["program"], w["phase"], w["n"], rng)
+        for j, (x, z, coeffs) in enumerate(w["terms"]):
+            v = float(np.real(pauli_expectations(psi, x, z) @ coeffs))
+            obs_sum[j] += v
+            obs_sumsq[j] += v * v
+        if w["shots"]:
+            probs = marginal_probabilities(psi, w["qubits"], w["n"])
+            outcomes.append(sample_cdf(probs, w["shots"], rng))
+    values, freq = np.unique(np.concatenate(outcomes), return_counts=True) if outcomes else ([], [])
+    return {"n": n_traj, "obs_sum": obs_sum, "obs_sumsq": obs_sumsq,
+            "counts": dict(zip(np.asarray(values).tolist(), np.asarray(freq).tolist()))}
+
+
+# --- driver ------------------------------------------------------------------------
+
+@dataclass
+class TrajectoryResult:
+    counts: dict
+    expectations: np.ndarray  # mean per observable
+    ci_half_width: np.ndarray  # per observable, at the requested confidence
+    counts_ci_half_width: float  # largest outcome-probability half-width
+    trajectories: int
+    shots: int
+    converged: bool
+    elapsed: float
+
+
+def run_trajectories(qc, noise, observables=(), shots_per_trajectory=1, precision=0.01, confidence=0.95,
+                     min_trajectories=64, max_trajectories=100_000, batch_size=32, n_workers=None,
+                     seed=None, executor="process"):
+    """Average trajectories until every CI half-width is <= precision.
+
+    observables: SparsePauliOp (or list of them); their expectation values
+    get normal-approximation intervals from the per-trajectory spread.
+    Counts come from shots_per_trajectory samples of each final state; the
+    largest binomial half-width over outcomes is also held to `precision`.
+    """
+    from qiskit.quantum_info import SparsePauliOp
+    from statevector_sampler import format_counts
+    single = isinstance(observables, SparsePauliOp) or isinstance(observables, str)
+    observables = [observables] if single else list(observables)
+    z = statistics.NormalDist().inv_cdf(0.5 + confidence / 2)
+    n_workers = n_workers or os.cpu_count() or 1
+    root = np.random.SeedSequence(seed)
+    init = (qc, noise, observables, shots_per_trajectory)
+    pool_cls = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+    if executor == "thread":
+        _init_worker(*init)
+        pool = pool_cls(n_workers)
+    else:
+        pool = pool_cls(n_workers, initializer=_init_worker, initargs=init)
+
+    if not measured_qubits(qc):
+        shots_per_trajectory = 0  # classical bits but no measurement: empty counts
+    m = len(observables)
+    total, obs_sum, obs_sumsq, counts = 0, np.zeros(m), np.zeros(m), {}
+    half, counts_half, converged = np.full(m, np.inf), np.inf, False
+    t0 = time.perf_counter()
+    next_batch, in_flight = 0, []
+
+    def submit():
+        nonlocal next_batch
+        if next_batch * batch_size < max_trajectories:
+            size = min(batch_size, max_trajectories - next_batch * batch_size)
+            in_flight.append(pool.submit(_run_batch, _child(root, next_batch), size))
+            next_batch += 1
+
+    try:
+        for _ in range(2 * n_workers):
+            submit()
+        while in_flight:
+            part = in_flight.pop(0).result()  # submission order keeps runs reproducible
+            total += part["n"]
+            obs_sum += part["obs_sum"]
+            obs_sumsq += part["obs_sumsq"]
+            for k, c in part["counts"].items():
+                counts[k] = counts.get(k, 0) + c
+            if m:
+                var = np.maximum(obs_sumsq / total - (obs_sum / total) ** 2, 0.0) * total / max(total - 1, 1)
+                half = z * np.sqrt(var / total)
+            shots = total * shots_per_trajectory
+            if shots:
+                p = np.array(list(counts.values())) / shots
+                counts_half = float(np.max(z * np.sqrt(p * (1 - p) / shots), initial=0.0))
+            else:
+                counts_half = 0.0
+            if total >= min_trajectories and np.all(half <= precision) and counts_half <= precision:
+                converged = True
+                break
+            submit()
+    finally:
+        for f in in_flight:
+            f.cancel()
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    measured = measured_qubits(qc)
+    outcomes = np.array(sorted(counts), dtype=np.int64)
+    if not measured:
+        keyed = {}
+    elif qc.num_clbits:
+        keyed = format_counts(outcomes, np.array([counts[k] for k in outcomes.tolist()]), measured, qc)
+    else:
+        keyed = {format(int(k), f"0{qc.num_qubits}b"): counts[k] for k in outcomes.tolist()}
+    return TrajectoryResult(keyed, obs_sum / max(total, 1), half, counts_half, total,
+                            total * shots_per_trajectory, converged, time.perf_counter() - t0)
+
+
+def _child(root, index):
+    """Deterministic child `index` of a SeedSequence (independent of spawn history)."""
+    return np.random.SeedSequence(root.entropy, spawn_key=root.spawn_key + (index,))
+
+
+def density_matrix_reference(qc, noise):
+    """Exact noisy final density matrix (qiskit.quantum_info), for small checks."""
+    from qiskit.quantum_info import DensityMatrix, Kraus, Operator
+    ops, phase = flatten_circuit(qc, names=True)
+    rho = DensityMatrix.from_int(0, 2 ** qc.num_qubits)
+    for mat, qubits, name in ops:
+        rho = rho.evolve(Operator(mat), qargs=qubits)
+        for channel, qs in noise.channels_for(name, qubits):
+            rho = rho.evolve(Kraus(list(channel.ops)), qargs=qs)
+    return rho
+
+
+def main(argv=None):
+    from qiskit import QuantumCircuit
+    from qiskit.quantum_info import SparsePauliOp
+    from statevector_sim import random_circuit
+
+    p = argparse.ArgumentParser(description="Parallel quantum-trajectory noise simulation")
+    p.add_argument("--qubits", type=int, default=16)
+    p.add_argument("--depth", type=int, default=6)
+    p.add_argument("--precision", type=float, default=0.01)
+    p.add_argument("--workers", type=int, default=os.cpu_count())
+    p.add_argument("--seed", type=int, default=7)
+    args = p.parse_args(argv)
+
+    noise = TrajectoryNoiseModel()
+    noise.add(depolarizing(0.02, 2), gates="cx")
+    noise.add(amplitude_damping(0.01), gates=("u", "h"))
+    noise.add(phase_damping(0.02), gates="cx")
+
+    # small check against the exact density matrix
+    qc = QuantumCircuit(6)
+    qc.h(0)
+    for q in range(5):
+        qc.cx(q, q + 1)
+    qc.u(0.3, 0.2, 0.1, 3)
+    obs = SparsePauliOp.from_sparse_list([("ZZ", [0, 5], 1.0), ("XX", [1, 2], 0.5)], num_qubits=6)
+    exact = float(np.real(density_matrix_reference(qc, noise).expectation_value(obs)))
+    res = run_trajectories(qc, noise, obs, precision=args.precision, n_workers=args.workers, seed=args.seed)
+    print(f"6-qubit GHZ with noise: <O> = {res.expectations[0]:.4f} +/- {res.ci_half_width[0]:.4f} "
+          f"(exact {exact:.4f}), {res.trajectories} trajectories, {res.elapsed:.2f} s, "
+          f"converged={res.converged}")
+
+    n = args.qubits
+    qc = random_circuit(n, args.depth)
+    qc.measure_all()
+    obs = SparsePauliOp.from_sparse_list([("Z", [q], 1.0 / n) for q in range(n)], num_qubits=n)
+    res = run_trajectories(qc, noise, obs, shots_per_trajectory=0, precision=args.precision,
+                           n_workers=args.workers, seed=args.seed)
+    print(f"{n}-qubit random circuit depth {args.depth}: <mean Z> = {res.expectations[0]:.4f} "
+          f"+/- {res.ci_half_width[0]:.4f}, {res.trajectories} trajectories on {args.workers} worker(s), "
+          f"{res.elapsed:.2f} s, converged={res.converged}")
+    print(f"  memory: statevector {16 * 2 ** n / 2**20:.3g} MiB per worker "
+          f"vs density matrix {16 * 4 ** n / 2**30:.3g} GiB")
+
+
+if __name__ == "__main__":
+    main()
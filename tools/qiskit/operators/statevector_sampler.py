@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Shot sampling directly from statevector probabilities.
+
+For a circuit whose measurements are final, the counts an Aer job returns
+are draws from |psi|^2 marginalised onto the measured qubits. This module
+computes that distribution exactly (statevector_sim) and samples it in one
+vectorised pass:
+
+  cdf       cumulative sum + searchsorted of sorted uniforms (one-off draws)
+  alias     Walker/Vose alias table, O(1) per shot once built (reused
+            distributions, e.g. repeated sampling of the same state)
+
+Counts come back in Qiskit's get_counts() format (clbit 0 rightmost,
+classical registers separated by spaces). Randomness comes from a
+numpy SeedSequence: the same seed gives the same counts, and each call of
+a StatevectorSampler draws from its own spawned child stream.
+
+Usage:
+  python3 statevector_sampler.py                   # 10^6 shots of a 20-qubit state
+  python3 statevector_sampler.py --qubits 24 --shots 10000000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from statevector_sim import simulate
+
+FINAL_OPS = {"measure", "barrier"}
+
+
+def measurement_map(qc):
+    """{clbit index: qubit index} of qc's measurements, checking they are final."""
+    measured = {}
+    done = set()
+    for inst in qc.data:
+        name = inst.operation.name
+        qubits = [qc.find_bit(q).index for q in inst.qubits]
+        if name == "measure":
+            measured[qc.find_bit(inst.clbits[0]).index] = qubits[0]
+            done.add(qubits[0])
+        elif name not in FINAL_OPS and done.intersection(qubits):
+            raise ValueError(f"'{name}' acts on a measured qubit; only final measurements "
+                             "can be sampled from the statevector")
+    return measured
+
+
+def marginal_probabilities(psi, qubits, n):
+    """P(outcome) over `qubits`; bit j of the outcome index is sorted(qubits)[j]."""
+    p = np.abs(np.asarray(psi).reshape((2,) * n)) ** 2
+    keep = {n - 1 - q for q in qubits}
+    p = p.sum(axis=tuple(a for a in range(n) if a not in keep)) if len(keep) < n else p
+    return p.reshape(-1)
+
+
+def sample_cdf(probs, shots, rng):
+    """Outcome indices by inverting the cumulative distribution (sorted order)."""
+    cdf = np.cumsum(probs)
+    u = np.sort(rng.random(shots)) * cdf[-1]  # sorted queries keep searchsorted cache-friendly
+    return np.minimum(cdf.searchsorted(u, side="right"), len(probs) - 1)
+
+
+def alias_table(probs):
+    """Vose alias table (prob, alias), built with vectorised pairing rounds."""
+    n = len(probs)
+    scaled = np.asarray(probs, dtype=float) * (n / np.sum(probs))
+    prob = np.ones(n)
+    alias = np.arange(n)
+    small = np.flatnonzero(scaled < 1.0)
+    large = np.flatnonzero(scaled >= 1.0)
+    while len(small) and len(large):
+        k = min(len(small), len(large))
+        s, l = small[:k], large[:k]
+        prob[s] = scaled[s]
+        alias[s] = l
+        scaled[l] -= 1.0 - scaled[s]
+        moved = scaled[l] < 1.0
+        small = np.concatenate([small[k:], l[moved]])
+        large = np.concatenate([large[k:], l[~moved]])
+    return prob, alias  # leftovers keep prob 1 (rounding residue)
+
+
+def sample_alias(table, shots, rng):
+    prob, alias = table
+    i = rng.integers(len(prob), size=shots)
+    return np.where(rng.random(shots) < prob[i], i, alias[i])
+
+
+def _bitstrings(values, width):
+    """Vectorised format(v, f'0{width}b') for an integer array."""
+    if width == 0:
+        return [""] * len(values)
+    shifts = np.arange(width - 1, -1, -1, dtype=np.uint64)
+    chars = ((values.astype(np.uint64)[:, None] >> shifts) & 1).astype(np.uint8) + ord("0")
+    return chars.view(f"S{width}").ravel().astype(f"U{width}").tolist()
+
+
+def format_counts(outcomes, frequencies, measured, qc):
+    """Qiskit-style counts dict from compact outcome indices (see marginal_probabilities)."""
+    order = sorted(set(measured.values()))
+    values = np.zeros(len(outcomes), dtype=np.int64)
+    for clbit, qubit in measured.items():
+        values |= ((outcomes >> order.index(qubit)) & 1) << clbit
+    keys = _bitstrings(values, qc.num_clbits)
+    sizes = [creg.size for creg in reversed(qc.cregs)]
+    if len(sizes) > 1 and sum(sizes) == qc.num_clbits:
+        cuts = np.cumsum([0] + sizes)
+        keys = [" ".join(k[a:b] for a, b in zip(cuts[:-1], cuts[1:])) for k in keys]
+    return dict(zip(keys, frequencies.tolist()))
+
+
+class StatevectorSampler:
+    """Samples a circuit's final measurements from its exact output distribution.
+
+    The circuit is simulated once; method="alias" builds an alias table on
+    the first call and reuses it, method="cdf" inverts the cumulative
+    distribution on every call.
+    """
+
+    def __init__(self, qc, seed=None, method="alias", psi=None):
+        if method not in ("alias", "cdf"):
+            raise ValueError(f"unknown method {method!r}")
+        self.qc = qc
+        self.method = method
+        self.measured = measurement_map(qc)
+        if not self.measured:
+            raise ValueError("circuit has no measurements")
+        psi = simulate(qc) if psi is None else psi
+        self.probs = marginal_probabilities(psi, set(self.measured.values()), qc.num_qubits)
+        self.seed_sequence = np.random.SeedSequence(seed)
+        self._table = None
+
+    def sample_indices(self, shots, rng=None):
+        rng = rng or np.random.default_rng(self.seed_sequence.spawn(1)[0])
+        if self.method == "cdf":
+            return sample_cdf(self.probs, shots, rng)
+        if self._table is None:
+            self._table = alias_table(self.probs)
+        return sample_alias(self._table, shots, rng)
+
+    def counts(self, shots=1024, rng=None):
+        freq = np.bincount(self.sample_indices(shots, rng), minlength=len(self.probs))
+        outcomes = np.flatnonzero(freq)
+        return format_counts(outcomes, freq[outcomes], self.measured, self.qc)
+
+
+def sample_counts(qc, shots=1024, seed=None, method="cdf"):
+    """One-off counts for qc (same keys as an Aer job's get_counts())."""
+    return StatevectorSampler(qc, seed=seed, method=method).counts(shots)
+
+
+def main(argv=None):
+    from statevector_sim import random_circuit
+
+    p = argparse.ArgumentParser(description="Statevector shot sampling benchmark")
+    p.add_argument("--qubits", type=int, default=20)
+    p.add_argument("--shots", type=int, default=10**6)
+    p.add_argument("--depth", type=int, default=4)
+    p.add_argument("--seed", type=int, default=1234)
+    args = p.parse_args(argv)
+
+    qc = random_circuit(args.qubits, args.depth)
+    qc.measure_all()
+    t0 = time.perf_counter()
+    psi = simulate(qc)
+    print(f"{args.qubits} qubits, {args.shots} shots (statevector {time.perf_counter() - t0:.2f} s)")
+    for method in ("cdf", "alias"):
+        sampler = StatevectorSampler(qc, seed=args.seed, method=method, psi=psi)
+        t0 = time.perf_counter()
+        counts = sampler.counts(args.shots)
+        first = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        sampler.counts(args.shots)
+        again = time.perf_counter() - t0
+        again_seeded = StatevectorSampler(qc, seed=args.seed, method=method, psi=psi).counts(args.shots)
+        print(f"  {method:5s}: first call {first:.3f} s, next call {again:.3f} s, "
+              f"{len(counts)} distinct outcomes, reproducible={again_seeded == counts}")
+
+
+if __name__ == "__main__":
+    main()
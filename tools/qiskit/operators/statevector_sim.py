@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Native NumPy statevector simulator for Qiskit circuits.
+
+The state of n qubits is kept as one complex vector viewed as an n-axis
+tensor of shape (2,)*n. A k-qubit gate is applied by contracting its
+(2,)*2k tensor with only the k touched axes, writing the result back into
+the same buffer chunk by chunk, so no 2^n x 2^n operator is ever built and
+the extra memory is bounded by the chunk size. Diagonal gates (rz, p, cz,
+...) are a broadcast in-place multiply. Amplitude ordering matches
+qiskit.quantum_info.Statevector (qubit 0 is the least significant bit).
+
+Usage:
+  python3 statevector_sim.py                      # scaling benchmark vs Statevector.from_instruction
+  python3 statevector_sim.py --max-qubits 26 --reference-max 20
+"""
+import argparse
+import itertools
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+CHUNK_ELEMS = 1 << 20  # amplitudes processed per contraction step
+SKIP_OPS = {"barrier", "delay", "id"}
+MAX_DENSE_QUBITS = 3  # composite gates wider than this are expanded through their definition
+FUSION_WIDTH = 4  # gates are fused into blocks of up to this many qubits (gate_fusion), 0 disables
+
+
+MATRIX_CACHE_SIZE = 4096  # standard-gate matrices kept (one per gate type and angle)
+_MATRIX_CACHE = OrderedDict()
+
+
+def standard_gate_key(op):
+    """(standard gate, ctrl_state, float params) for a gate fully defined by them, else None.
+
+    Only Qiskit's standard gates qualify: library gates such as
+    PauliEvolutionGate or UnitaryGate carry their operator outside params,
+    so two of them with equal params can still differ.
+    """
+    std = getattr(op, "_standard_gate", None)
+    if std is None:
+        return None
+    try:
+        return (std, getattr(op, "ctrl_state", None), tuple(float(p) for p in op.params))
+    except (TypeError, ValueError):
+        return None  # unbound Parameter
+
+
+def gate_matrix(op):
+    """op.to_matrix() as a complex array, memoised (LRU) for bound standard gates."""
+    key = standard_gate_key(op)
+    if key is not None:
+        mat = _MATRIX_CACHE.get(key)
+        if mat is not None:
+            _MATRIX_CACHE.move_to_end(key)
+            return mat
+    mat = np.asarray(op.to_matrix(), dtype=complex)
+    if key is not None:
+        mat.setflags(write=False)
+        _MATRIX_CACHE[key] = mat
+        if len(_MATRIX_CACHE) > MATRIX_CACHE_SIZE:
+            _MATRIX_CACHE.popitem(last=False)
+    return mat
+
+
+def flatten_circuit(qc, qubit_map=None, ignore_measurements=True, max_qubits=MAX_DENSE_QUBITS,
+                    names=False):
+    """Return ([(matrix, qubits), ...], global_phase) for a QuantumCircuit.
+
+    Standard gates use their own to_matrix(); composite gates and gates on
+    more than max_qubits qubits are expanded recursively through their
+    definition. With names=True the entries are (matrix, qubits, gate name).
+    """
+    if qubit_map is None:
+        qubit_map = {q: i for i, q in enumerate(qc.qubits)}
+    ops = []
+    phase = float(qc.global_phase)
+    for inst in qc.data:
+        op = inst.operation
+        qubits = [qubit_map[q] for q in inst.qubits]
+        if op.name in SKIP_OPS:
+            continue
+        if op.name == "measure":
+            if ignore_measurements:
+                continue
+            raise ValueError("measurements are not supported by the statevector engine")
+        if getattr(op, "condition", None) is not None or op.name in ("reset", "initialize"):
+            raise ValueError(f"non-unitary instruction '{op.name}' is not supported")
+        mat = None
+        if op.num_qubits <= max_qubits:
+            try:
+                mat = gate_matrix(op)
+            except Exception:
+                mat = None
+        if mat is None:
+            if getattr(op, "definition", None) is None:
+                raise ValueError(f"gate '{op.name}' has neither a matrix nor a definition "
+                                 "(unbound parameters?)")
+            sub_map = {q: qubits[i] for i, q in enumerate(op.definition.qubits)}
+            sub_ops, sub_phase = flatten_circuit(op.definition, sub_map, ignore_measurements, max_qubits, names)
+            ops.extend(sub_ops)
+            phase += sub_phase
+            continue
+        ops.append((mat, qubits, op.name) if names else (mat, qubits))
+    return ops, phase
+
+
+def _chunks(shape, targets, chunk_elems):
+    """Index tuples that cover the tensor in pieces of about chunk_elems.
+
+    Non-target axes are fixed one at a time (integer index) until the rest
+    fits, and the next axis is cut into ranges. Returns (indices, fixed_axes).
+    """
+    rest = [a for a in range(len(shape)) if a not in targets]
+    remaining = int(np.prod(shape))
+    fixed, split = [], None
+    for a in rest:
+        if remaining <= chunk_elems:
+            break
+        if remaining // shape[a] >= chunk_elems:
+            fixed.append(a)
+            remaining //= shape[a]
+        else:
+            split = (a, max(1, chunk_elems // (remaining // shape[a])))
+            break
+    ranges = []
+    for a in range(len(shape)):
+        if a in fixed:
+            ranges.append(range(shape[a]))
+        elif split is not None and a == split[0]:
+            ranges.append([slice(lo, lo + split[1]) for lo in range(0, shape[a], split[1])])
+        else:
+            ranges.append([slice(None)])
+    return itertools.product(*ranges), fixed
+
+
+def apply_gate(tensor, mat, axes, chunk_elems=CHUNK_ELEMS):
+    """Apply a 2^k x 2^k matrix in place to `axes` of `tensor`.
+
+    axes[i] is the tensor axis of the gate's i-th most significant qubit,
+    i.e. of qargs[k-1-i] (Qiskit little-endian matrix convention).
+    """
+    k = len(axes)
+    if not np.any(mat - np.diag(np.diagonal(mat))):
+        # diagonal: broadcast multiply, no temporary state
+        d = np.diagonal(mat).reshape((2,) * k)
+        order = np.argsort(axes)
+        shape = [1] * tensor.ndim
+        for a in axes:
+            shape[a] = 2
+        tensor *= d.transpose(order).reshape(shape)
+        return tensor
+    u = mat.reshape((2,) * (2 * k))
+    in_axes = list(range(k, 2 * k))
+    indices, fixed = _chunks(tensor.shape, axes, chunk_elems)
+    sub_axes = [a - sum(f < a for f in fixed) for a in axes]
+    for idx in indices:
+        sub = tensor[idx]
+        new = np.tensordot(u, sub, axes=(in_axes, sub_axes))
+        sub[...] = np.moveaxis(new, range(k), sub_axes)
+    return tensor
+
+
+def qubit_axes(qubits, n, offset=0):
+    """Tensor axes for a gate on `qubits` (see apply_gate), after `offset` batch axes."""
+    return [offset + n - 1 - q for q in reversed(qubits)]
+
+
+def simulate(qc, initial_state=None, dtype=np.complex128, chunk_elems=CHUNK_ELEMS,
+             ignore_measurements=True, fusion_width=FUSION_WIDTH):
+    """Final statevector of `qc` as a flat array (Statevector.data ordering).
+
+    initial_state defaults to |0...0>; if given it is copied, never modified.
+    Final measurements are ignored unless ignore_measurements=False.
+    Gates are first fused into blocks of up to fusion_width qubits
+    (gate_fusion.fuse_gates), one state sweep per block; 0 disables fusion.
+    """
+    n = qc.num_qubits
+    if initial_state is None:
+        psi = np.zeros(1 << n, dtype=dtype)
+        psi[0] = 1.0
+    else:
+        psi = np.array(initial_state, dtype=dtype).reshape(1 << n)
+    ops, phase = flatten_circuit(qc, ignore_measurements=ignore_measurements)
+    if fusion_width:
+        from gate_fusion import fuse_gates
+        ops = fuse_gates(ops, fusion_width)
+    tensor = psi.reshape((2,) * n)
+    for mat, qubits in ops:
+        apply_gate(tensor, mat.astype(dtype, copy=False), qubit_axes(qubits, n), chunk_elems)
+    if phase:
+        psi *= np.exp(1j * phase)
+    return psi
+
+
+# --- benchmark ---------------------------------------------------------------
+
+def random_circuit(n, depth, seed=0):
+    """Layers of random single-qubit rotations followed by a CX brick pattern."""
+    from qiskit import QuantumCircuit
+    rng = np.random.default_rng(seed)
+    qc = QuantumCircuit(n)
+    for layer in range(depth):
+        for q in range(n):
+            qc.u(*rng.uniform(0, 2 * np.pi, 3), q)
+        for q in range(layer % 2, n - 1, 2):
+            qc.cx(q, q + 1)
+    return qc
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Native statevector scaling benchmark")
+    p.add_argument("--min-qubits", type=int, default=4)
+    p.add_argument("--max-qubits", type=int, default=24)
+    p.add_argument("--step", type=int, default=2)
+    p.add_argument("--depth", type=int, default=10)
+    p.add_argument("--reference-max", type=int, default=20,
+                   help="largest n also run through Statevector.from_instruction")
+    args = p.parse_args(argv)
+
+    from qiskit.quantum_info import Statevector
+
+    print(f"Random circuits, depth {args.depth} (u on every qubit + CX bricks per layer)")
+    print(f"{'n':>3}  {'gates':>6}  {'state MiB':>9}  {'native s':>9}  {'Statevector s':>13}  {'speedup':>7}  max|diff|")
+    for n in range(args.min_qubits, args.max_qubits + 1, args.step):
+        qc = random_circuit(n, args.depth)
+        t0 = time.perf_counter()
+        psi = simulate(qc)
+        t_native = time.perf_counter() - t0
+        line = f"{n:3d}  {qc.size():6d}  {psi.nbytes / 2**20:9.1f}  {t_native:9.4f}"
+        if n <= args.reference_max:
+            t0 = time.perf_counter()
+            ref = Statevector.from_instruction(qc).data
+            t_ref = time.perf_counter() - t0
+            line += f"  {t_ref:13.4f}  {t_ref / t_native:6.1f}x  {np.max(np.abs(psi - ref)):.1e}"
+        else:
+            line += f"  {'-':>13}  {'-':>7}"
+        print(line)
+        del psi
+
+
+if __name__ == "__main__":
+    main()